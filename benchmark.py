@@ -0,0 +1,266 @@
+"""
+benchmark.py
+
+Mesures de performance de pygraph, à lancer depuis la racine du dépôt :
+
+    python benchmark.py importtime [budget_ms]
+    python benchmark.py edges [m]
+    python benchmark.py settled [m]
+    python benchmark.py contraction [side]
+    python benchmark.py check
+
+importtime : temps d'import propre de pygraph et path_finder (python -X importtime) ;
+échoue si le budget est dépassé ou si une dépendance lourde est chargée dès l'import.
+edges : insertion de m arêtes (10**6 par défaut), arête par arête avec add_edge puis en
+un passage avec add_edges_from (tuples, tableau NumPy, backend csr).
+settled : nœuds verrouillés par Dijkstra et par Dijkstra bidirectionnel pour des questions
+point à point au hasard sur un graphe de m arêtes (10**5 par défaut).
+contraction : construction d'une hiérarchie de contraction sur une grille side x side
+(60 par défaut) aux poids aléatoires, puis temps et nœuds verrouillés par question,
+comparés au Dijkstra bidirectionnel.
+check : vérifications de non-régression rapides ; échoue si l'une d'elles est fausse.
+"""
+
+import os
+import random
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+
+# -- import time
+
+IMPORTED = ('pygraph', 'path_finder.dijkstra')
+OWN_MODULES = ('pygraph', 'constantes', 'lazy', 'view_store', 'cow', 'dot_view', 'render_cache', 'csr', 'shared_graph', 'path_finder')
+LAZY_DEPENDENCIES = ('networkx', 'graphviz', 'tkinter', 'numpy')
+IMPORT_BUDGET_MS = 30
+
+
+def import_times(modules=IMPORTED):
+    """Retourne {module: (self µs, cumulé µs)} mesuré par python -X importtime dans un nouveau processus"""
+    code = 'import ' + ', '.join(modules)
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', code], cwd=ROOT,
+                            capture_output=True, text=True, check=True)
+    times = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        own, cumulative, name = line[len('import time:'):].split('|')
+        times[name.strip()] = int(own), int(cumulative)
+    return times
+
+
+def import_budget(budget_ms=IMPORT_BUDGET_MS, modules=IMPORTED):
+    """
+    Vérifie le budget d'import : retourne (temps propre en ms, dépendances lourdes chargées, ok).
+    Le temps propre est la somme des temps self des modules du dépôt.
+    """
+    times = import_times(modules)
+    own = sum(t[0] for name, t in times.items() if name.split('.')[0] in OWN_MODULES) / 1000
+    eager = [name for name in LAZY_DEPENDENCIES if name in times]
+    return own, eager, own <= budget_ms and not eager
+
+
+# -- edge insertion
+
+EDGES_COUNT = 10**6
+
+
+def random_edges(edges_count, seed=0):
+    # edges_count weighted edges between edges_count // 10 nodes
+    rng = random.Random(seed)
+    nodes_count = max(2, edges_count // 10)
+    return nodes_count, [(rng.randrange(nodes_count), rng.randrange(nodes_count), rng.randint(1, 9))
+                         for _ in range(edges_count)]
+
+
+def timed(function, *args):
+    start = time.perf_counter()
+    function(*args)
+    return time.perf_counter() - start
+
+
+def edge_insertion(edges_count=EDGES_COUNT):
+    """Retourne {méthode: secondes} pour l'insertion de edges_count arêtes dans un Graph"""
+    from pygraph import Graph
+    nodes_count, edges = random_edges(edges_count)
+
+    def one_by_one(g):
+        for s1, s2, weight in edges:
+            g.add_edge(s1, s2, weight)
+
+    times = {
+        'add_edge loop': timed(one_by_one, Graph(nodes_count)),
+        'add_edges_from tuples': timed(Graph(nodes_count).add_edges_from, edges),
+    }
+    try:
+        import numpy as np
+    except ImportError:
+        return times
+    array = np.array(edges, dtype=np.int64)
+    times['add_edges_from array'] = timed(Graph(nodes_count).add_edges_from, array)
+    times['add_edges_from array, csr'] = timed(Graph(nodes_count, backend='csr').add_edges_from, array)
+    return times
+
+
+# -- point to point queries
+
+SETTLED_EDGES_COUNT = 10**5
+QUERIES_COUNT = 20
+
+
+def settled_nodes(edges_count=SETTLED_EDGES_COUNT, queries_count=QUERIES_COUNT, seed=0):
+    """Retourne {algorithme: nœuds verrouillés en moyenne} pour queries_count questions (start, end)"""
+    from pygraph import Graph
+    from path_finder.dijkstra import Dijkstra
+    from path_finder.bidirectional import BidirectionalDijkstra
+    nodes_count, edges = random_edges(edges_count, seed)
+    g = Graph(nodes_count, backend='csr')
+    g.add_edges_from(edges)
+    rng = random.Random(seed)
+    settled = {'dijkstra': 0, 'bidirectional': 0}
+    for _ in range(queries_count):
+        start, end = rng.randrange(nodes_count), rng.randrange(nodes_count)
+        dijkstra = Dijkstra(g, start, end, headless=True)
+        bidirectional = BidirectionalDijkstra(g, start, end)
+        dijkstra.solve()
+        bidirectional.solve()
+        settled['dijkstra'] += dijkstra.settled_count()
+        settled['bidirectional'] += bidirectional.settled_count()
+    return {algorithm: count / queries_count for algorithm, count in settled.items()}
+
+
+GRID_SIDE = 60
+
+
+def grid_edges(side, seed=0):
+    # A road-like graph : side x side grid, weights 1 .. 9
+    rng = random.Random(seed)
+    edges = []
+    for node_id in range(side * side):
+        if node_id % side < side - 1:
+            edges.append((node_id, node_id + 1, rng.randint(1, 9)))
+        if node_id + side < side * side:
+            edges.append((node_id, node_id + side, rng.randint(1, 9)))
+    return side * side, edges
+
+
+def contraction_queries(side=GRID_SIDE, queries_count=QUERIES_COUNT, seed=0):
+    """Retourne (secondes de construction, {algorithme: (ms, nœuds verrouillés) en moyenne par question})"""
+    from pygraph import Graph
+    from path_finder.bidirectional import BidirectionalDijkstra
+    from path_finder.contraction import ContractionHierarchy
+    nodes_count, edges = grid_edges(side, seed)
+    g = Graph(nodes_count, backend='csr')
+    g.add_edges_from(edges)
+    start = time.perf_counter()
+    hierarchy = ContractionHierarchy(g)
+    build = time.perf_counter() - start
+    rng = random.Random(seed)
+    pairs = [(rng.randrange(nodes_count), rng.randrange(nodes_count)) for _ in range(queries_count)]
+    totals = {'bidirectional': [0, 0], 'contraction': [0, 0]}
+    for start_id, end_id in pairs:
+        bidirectional = BidirectionalDijkstra(g, start_id, end_id)
+        totals['bidirectional'][0] += timed(bidirectional.solve)
+        totals['bidirectional'][1] += bidirectional.settled_count()
+        totals['contraction'][0] += timed(hierarchy.path, start_id, end_id)
+        totals['contraction'][1] += hierarchy.settled
+    return build, {algorithm: (1000 * seconds / queries_count, settled / queries_count)
+                   for algorithm, (seconds, settled) in totals.items()}
+
+
+def main(argv):
+    if not argv or argv[0] == 'importtime':
+        budget = float(argv[1]) if len(argv) > 1 else IMPORT_BUDGET_MS
+        own, eager, ok = import_budget(budget)
+        print(f'import {", ".join(IMPORTED)} : {own:.1f} ms (budget {budget} ms)')
+        if eager:
+            print('loaded at import time :', ', '.join(eager))
+        return 0 if ok else 1
+    if argv[0] == 'edges':
+        edges_count = int(float(argv[1])) if len(argv) > 1 else EDGES_COUNT
+        for method, seconds in edge_insertion(edges_count).items():
+            print(f'{method:28} {edges_count} edges : {seconds:.2f} s')
+        return 0
+    if argv[0] == 'settled':
+        edges_count = int(float(argv[1])) if len(argv) > 1 else SETTLED_EDGES_COUNT
+        for algorithm, count in settled_nodes(edges_count).items():
+            print(f'{algorithm:14} {edges_count} edges : {count:.0f} settled nodes per query')
+        return 0
+    if argv[0] == 'contraction':
+        side = int(argv[1]) if len(argv) > 1 else GRID_SIDE
+        build, queries = contraction_queries(side)
+        print(f'contraction hierarchy of a {side}x{side} grid : built in {build:.2f} s')
+        for algorithm, (ms, settled) in queries.items():
+            print(f'{algorithm:14} {ms:.2f} ms, {settled:.0f} settled nodes per query')
+        return 0
+    if argv[0] == 'check':
+        results = run_checks()
+        for name, ok in results.items():
+            print(f'{name:32} {"ok" if ok else "FAILED"}')
+        return 0 if all(results.values()) else 1
+    print(__doc__)
+    return 2
+
+
+# -- regression checks
+
+def check_dense_node_store(nodes_count=200000):
+    # The nodes of Graph(n) and add_nodes(n) are in the arrays of the node store, none is sparse
+    from pygraph import Graph
+    g = Graph(nodes_count)
+    h = Graph()
+    h.add_nodes(nodes_count)
+    return len(g.node_store.sparse) == 0 and len(h.node_store.sparse) == 0
+
+
+def check_contraction_paths(nodes_count=60, queries_count=300, seed=0):
+    # Every consecutive pair of a contraction hierarchy path is an edge, its length is the distance
+    from pygraph import Graph, DiGraph
+    from path_finder.contraction import ContractionHierarchy
+    rng = random.Random(seed)
+    for graph_class in (Graph, DiGraph):
+        g = graph_class(nodes_count)
+        g.add_edges_from([(rng.randrange(nodes_count), rng.randrange(nodes_count), rng.choice([0, 0.5, 1.25, 2, 3.7]))
+                          for _ in range(3 * nodes_count)])
+        hierarchy = ContractionHierarchy(g, witness_limit=5)
+        for _ in range(queries_count):
+            start, end = rng.randrange(nodes_count), rng.randrange(nodes_count)
+            path = hierarchy.path(start, end)
+            if any(not g.model.has_edge(u, v) for u, v in zip(path, path[1:])):
+                return False
+            length = sum(min(w for x, w in g.weighted_neighbors(u) if x == v) for u, v in zip(path, path[1:]))
+            if path and abs(length - hierarchy.distance(start, end)) > 1e-9:
+                return False
+    return True
+
+
+def check_pickled_subclass():
+    # A pickled BiPartite comes back with its own attributes, its edges and its view
+    import pickle
+    from pygraph import BiPartite
+    g = BiPartite(3, 4)
+    g.add_edge(0, 5, 2)
+    g.tag = 'kept'
+    h = pickle.loads(pickle.dumps(g))
+    return (type(h) is BiPartite and (h.n1, h.n2, h.tag) == (3, 4, 'kept')
+            and sorted(h.edges()) == sorted(g.edges()) and h.view.source == g.view.source)
+
+
+CHECKS = (check_dense_node_store, check_contraction_paths, check_pickled_subclass)
+
+
+def run_checks():
+    """Retourne {vérification: ok} ; une vérification qui lève une exception a échoué"""
+    results = {}
+    for check in CHECKS:
+        try:
+            results[check.__name__] = bool(check())
+        except Exception:
+            results[check.__name__] = False
+    return results
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
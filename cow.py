@@ -0,0 +1,64 @@
+"""
+cow.py
+
+Partage copy-on-write des données d'un graphe entre ses copies (Graph.copy).
+
+Une donnée partagée est rangée dans une boîte Shared comptant ses propriétaires : copier
+un graphe ne fait que partager ses boîtes, en O(1). Avant d'écrire, un propriétaire
+appelle own() ; s'il n'est pas le seul, il reçoit une nouvelle boîte avec une copie de
+la donnée et les autres gardent l'ancienne. Seule la donnée modifiée est copiée.
+Un propriétaire range ses boîtes dans un dictionnaire suivi par track() : à sa destruction
+il les rend toutes, une copie abandonnée ne force donc pas la copie de la donnée.
+"""
+
+import weakref
+
+
+class Shared:
+    """
+    class Shared
+
+    Parameters:
+    -----------
+        value : object
+            la donnée partagée
+    """
+
+    __slots__ = ('value', 'users')
+
+    def __init__(self, value):
+        self.value = value
+        self.users = 1
+
+
+def share(box):
+    # One more owner for the box
+    box.users += 1
+    return box
+
+
+def release(box):
+    # The caller no longer uses the box
+    box.users -= 1
+
+
+def own(box, clone=None):
+    # A box owned by the caller alone : the same one, or a new one with clone(value)
+    # (value.copy() by default)
+    if box.users == 1:
+        return box
+    box.users -= 1
+    return Shared(box.value.copy() if clone is None else clone(box.value))
+
+
+def release_all(boxes):
+    # The owner of the boxes is gone
+    for box in boxes.values():
+        release(box)
+
+
+def track(owner, boxes):
+    # boxes (name: Shared) are released when owner is collected : the owner keeps the
+    # dictionary up to date with the boxes it currently holds
+    weakref.finalize(owner, release_all, boxes)
+    return boxes
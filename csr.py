@@ -0,0 +1,568 @@
+"""
+csr.py
+
+Modèle compact (Compressed Sparse Row) pour pygraph : Graph(backend="csr").
+
+La topologie est gardée dans des tableaux NumPy :
+    - une liste d'arêtes canonique (origine int32, destination int32, poids float64) ;
+    - sa forme CSR, calculée à la demande : offsets (n + 1), voisins int32 et poids float64,
+      les voisins de chaque nœud étant triés.
+Un graphe non orienté range chaque arête dans les deux lignes. Soit environ 40 octets
+par arête au lieu de plusieurs centaines pour les dictionnaires imbriqués de networkx.
+
+CSRModel reproduit la partie de l'API networkx utilisée par Graph, DiGraph et path_finder
+(nodes, edges, adj, neighbors, degree, add_*, remove_*...). Les ajouts et retraits sont mis
+en attente et la forme CSR est recalculée en O(m log m) à la requête suivante : il vaut
+mieux les regrouper (add_edges_from, remove_edges_from). has_edge et weight lisent les
+changements en attente puis les tableaux déjà calculés, sans les recalculer.
+Les identifiants de nœuds sont des entiers positifs ; un poids absent est stocké comme NaN.
+Tant que tous les poids donnés sont entiers (ou absents), ils sont rendus en int comme ils
+ont été donnés, sinon en float.
+"""
+
+import numpy as np
+
+PENDING_LIMIT = 64 # Edges added since the arrays were computed that a row query merges before rebuilding them
+BULK_REMOVAL = 256 # Nodes removed at once from which one pass over the edge list is cheaper than their rows
+
+
+def int_weights(weights):
+    # The weights given (a scalar, a sequence or an array, None for absent) are all integers
+    if weights is None:
+        return True
+    if isinstance(weights, (int, np.integer)):
+        return True
+    if isinstance(weights, (float, np.floating)):
+        return False
+    weights = np.asarray(weights)
+    if not weights.size or weights.dtype.kind in 'iub':
+        return True
+    if weights.dtype.kind == 'O':
+        return all(w is None or isinstance(w, (int, np.integer)) for w in weights.tolist())
+    return False
+
+
+class CSRNodes:
+    """Vue des nœuds d'un CSRModel : itération, len, in et données nodes[node_id] (dict)"""
+
+    def __init__(self, model):
+        self.__model = model
+
+    def __iter__(self):
+        return self.__model.iter_nodes()
+
+    def __len__(self):
+        return self.__model.number_of_nodes()
+
+    def __contains__(self, node_id):
+        return self.__model.has_node(node_id)
+
+    def __getitem__(self, node_id):
+        return self.__model.node_data(node_id)
+
+    def items(self):
+        return ((node_id, self.__model.node_data(node_id)) for node_id in self)
+
+
+class CSREdges:
+    """Vue des arêtes d'un CSRModel : itération des couples, edges[u, v] (dict) et edges(node_id)"""
+
+    def __init__(self, model):
+        self.__model = model
+
+    def __iter__(self):
+        return self.__model.iter_edges()
+
+    def __len__(self):
+        return self.__model.number_of_edges()
+
+    def __contains__(self, edge):
+        return self.__model.has_edge(*edge)
+
+    def __getitem__(self, edge):
+        return self.__model.edge_data(*edge)
+
+    def __call__(self, node_id=None, data=False):
+        # data='weight' : triplets (u, v, poids) comme networkx
+        if node_id is not None:
+            return self.__model.out_edges(node_id)
+        if data:
+            src, dst, weight = self.__model.edge_arrays()
+            weights = [self.__model.weight_value(w) for w in weight.tolist()]
+            return list(zip(src.tolist(), dst.tolist(), weights))
+        return list(self)
+
+
+class CSRRow:
+    """Ligne u de la matrice d'adjacence : adj[u][v] est le dict des données de l'arête"""
+
+    def __init__(self, model, node_id):
+        self.__model = model
+        self.__id = node_id
+
+    def __iter__(self):
+        return iter(self.__model.neighbors(self.__id))
+
+    def __len__(self):
+        return self.__model.out_degree(self.__id)
+
+    def __contains__(self, node_id):
+        return self.__model.has_edge(self.__id, node_id)
+
+    def __getitem__(self, node_id):
+        return self.__model.edge_data(self.__id, node_id)
+
+    def items(self):
+        return ((v, self.__model.edge_data(self.__id, v)) for v in self)
+
+
+class CSRAdjacency:
+    def __init__(self, model):
+        self.__model = model
+
+    def __getitem__(self, node_id):
+        if not self.__model.has_node(node_id):
+            raise KeyError(node_id)
+        return CSRRow(self.__model, node_id)
+
+    def items(self):
+        return ((u, CSRRow(self.__model, u)) for u in self.__model.iter_nodes())
+
+
+class CSRModel:
+    """
+    class CSRModel modélise la topologie d'un graphe (orienté ou non) dans des tableaux CSR.
+
+    Parameters:
+    -----------
+        nodes_count : int
+            nombre de sommets initial, identifiés de 0 à nodes_count - 1
+        directed : bool
+            graphe orienté ou non
+
+    Note:
+    -----
+        Les données annexes des nœuds (nodes[node_id]) sont des dictionnaires créés à la
+        demande. Celles d'une arête (edges[u, v]) sont une copie : la clé 'weight' reflète
+        le tableau des poids, les attributs se modifient par add_edge.
+    """
+
+    def __init__(self, nodes_count=0, directed=False):
+        self.__directed = directed
+        self.__n = 0 # Identifiants alloués : 0 .. n - 1
+        self.__absent = set() # Identifiants alloués mais retirés
+        # Canonical edge list, (min, max) for an undirected graph
+        self.__src = np.empty(0, dtype=np.int32)
+        self.__dst = np.empty(0, dtype=np.int32)
+        self.__weight = np.empty(0, dtype=np.float64)
+        self.__pending = [] # Arêtes (u, v, poids) ajoutées depuis le dernier calcul
+        self.__removed = set() # Clés canoniques retirées depuis le dernier calcul
+        self.__added = {} # Clé canonique: dernier poids des arêtes de __pending
+        self.__dirty = False
+        self.__unindexed = False # La liste d'arêtes contient des arêtes absentes des tableaux CSR
+        self.__offsets = np.zeros(1, dtype=np.int32)
+        self.__neighbors = np.empty(0, dtype=np.int32)
+        self.__weights = np.empty(0, dtype=np.float64)
+        self.__reverse = None # (offsets, voisins, poids) des prédécesseurs, orienté seulement
+        self.__node_data = {}
+        self.__edge_data = {}
+        self.__int_weights = True # Every weight given is an integer : they are returned as int
+        self.add_nodes_from(range(nodes_count))
+
+    @classmethod
+    def from_networkx(cls, nx_graph):
+        model = cls(directed=nx_graph.is_directed())
+        model.add_nodes_from(nx_graph.nodes)
+        model.add_edges_from((u, v, data.get('weight')) for u, v, data in nx_graph.edges(data=True))
+        return model
+
+    @classmethod
+    def from_arrays(cls, nodes_count, src, dst, weight=None, directed=False):
+        model = cls(nodes_count, directed)
+        model.add_edge_arrays(src, dst, weight)
+        return model
+
+    @classmethod
+    def from_compiled(cls, absent, directed, edges, csr, reverse=None, int_weights=False):
+        """
+        Modèle bâti directement sur des tableaux déjà calculés (edge_arrays, csr, reverse_csr),
+        par exemple en mémoire partagée : rien n'est copié. Le nombre d'identifiants est
+        len(offsets) - 1 ; int_weights : les poids sont rendus en int (voir has_int_weights).
+        """
+        model = cls(0, directed)
+        model.__int_weights = int_weights
+        model.__src, model.__dst, model.__weight = edges
+        model.__offsets, model.__neighbors, model.__weights = csr
+        model.__reverse = reverse if directed else None
+        model.__n = len(model.__offsets) - 1
+        model.__absent = set(absent)
+        return model
+
+    def copy(self):
+        # The arrays are never modified in place : they are shared, only the containers are copied
+        model = CSRModel.__new__(CSRModel)
+        model.__dict__.update(self.__dict__)
+        model.__pending = list(self.__pending)
+        model.__absent = set(self.__absent)
+        model.__removed = set(self.__removed)
+        model.__added = dict(self.__added)
+        model.__node_data = {node_id: dict(data) for node_id, data in self.__node_data.items()}
+        model.__edge_data = {key: dict(data) for key, data in self.__edge_data.items()}
+        return model
+
+    # -- about the arrays
+
+    def is_directed(self):
+        return self.__directed
+
+    def has_int_weights(self):
+        # Every weight given was an integer (or absent)
+        return self.__int_weights
+
+    def weight_value(self, w):
+        # A weight of the arrays as given : None if absent, int if every weight is an integer
+        if w != w:
+            return None
+        return int(w) if self.__int_weights else w
+
+    def key(self, u, v):
+        return (u, v) if self.__directed or u <= v else (v, u)
+
+    def _compile(self):
+        # Apply pending additions and removals, then rebuild the CSR arrays
+        if not self.__dirty:
+            return
+        src, dst, weight = self.__src, self.__dst, self.__weight
+        if self.__pending:
+            pending_src, pending_dst, pending_weight = zip(*self.__pending)
+            src = np.concatenate((src, np.asarray(pending_src, dtype=np.int32)))
+            dst = np.concatenate((dst, np.asarray(pending_dst, dtype=np.int32)))
+            weight = np.concatenate((weight, np.asarray(pending_weight, dtype=np.float64)))
+            self.__pending = []
+            self.__added = {}
+        n = max(self.__n, 1)
+        keys = src.astype(np.int64) * n + dst
+        if self.__removed:
+            removed = np.fromiter((u * n + v for u, v in self.__removed), dtype=np.int64, count=len(self.__removed))
+            keep = ~np.isin(keys, removed)
+            src, dst, weight, keys = src[keep], dst[keep], weight[keep], keys[keep]
+            self.__removed = set()
+        # A re-added edge keeps its last weight, at its first position
+        _, last = np.unique(keys[::-1], return_index=True)
+        keep = np.sort(len(keys) - 1 - last)
+        self.__src, self.__dst, self.__weight = src[keep], dst[keep], weight[keep]
+        self.__offsets, self.__neighbors, self.__weights = self._csr(self.__src, self.__dst, self.__weight, not self.__directed)
+        self.__reverse = None
+        self.__dirty = False
+        self.__unindexed = False
+
+    def _csr(self, src, dst, weight, symmetric):
+        if symmetric:
+            loops = src == dst
+            rows = np.concatenate((src, dst[~loops]))
+            cols = np.concatenate((dst, src[~loops]))
+            weight = np.concatenate((weight, weight[~loops]))
+        else:
+            rows, cols = src, dst
+        order = np.lexsort((cols, rows))
+        counts = np.bincount(rows, minlength=self.__n)
+        index_type = np.int32 if len(rows) < 2**31 else np.int64
+        offsets = np.zeros(self.__n + 1, dtype=index_type)
+        np.cumsum(counts, out=offsets[1:])
+        return offsets, cols[order].astype(np.int32), weight[order]
+
+    def csr(self):
+        """Retourne les tableaux (offsets, voisins, poids) des successeurs"""
+        self._compile()
+        return self.__offsets, self.__neighbors, self.__weights
+
+    def reverse_csr(self):
+        """Retourne les tableaux (offsets, voisins, poids) des prédécesseurs"""
+        self._compile()
+        if not self.__directed:
+            return self.__offsets, self.__neighbors, self.__weights
+        if self.__reverse is None:
+            self.__reverse = self._csr(self.__dst, self.__src, self.__weight, False)
+        return self.__reverse
+
+    def edge_arrays(self):
+        """Retourne la liste canonique des arêtes (origines, destinations, poids)"""
+        self._compile()
+        return self.__src, self.__dst, self.__weight
+
+    def nbytes(self):
+        self._compile()
+        arrays = (self.__src, self.__dst, self.__weight, self.__offsets, self.__neighbors, self.__weights)
+        return sum(array.nbytes for array in arrays)
+
+    # -- about nodes
+
+    @property
+    def nodes(self):
+        return CSRNodes(self)
+
+    def iter_nodes(self):
+        absent = self.__absent
+        return (node_id for node_id in range(self.__n) if node_id not in absent)
+
+    def has_node(self, node_id):
+        return isinstance(node_id, (int, np.integer)) and 0 <= node_id < self.__n and node_id not in self.__absent
+
+    def number_of_nodes(self):
+        return self.__n - len(self.__absent)
+
+    def node_data(self, node_id):
+        if not self.has_node(node_id):
+            raise KeyError(node_id)
+        return self.__node_data.setdefault(node_id, {})
+
+    def add_node(self, node_id, **data):
+        if node_id >= self.__n:
+            # The offsets are rebuilt at the next query
+            self.__absent.update(range(self.__n, node_id))
+            self.__n = node_id + 1
+            self.__dirty = True
+        self.__absent.discard(node_id)
+        if data:
+            self.node_data(node_id).update(data)
+
+    def add_nodes_from(self, iterable):
+        if isinstance(iterable, range) and iterable.step == 1 and len(iterable):
+            # Bulk : a block of consecutive ids
+            self.add_node(iterable[-1])
+            if self.__absent:
+                self.__absent.difference_update(iterable)
+            return
+        for node in iterable:
+            if isinstance(node, (int, np.integer)):
+                self.add_node(int(node))
+            else:
+                node_id, data = node
+                self.add_node(node_id, **data)
+
+    def remove_node(self, node_id):
+        if not self.has_node(node_id):
+            raise KeyError(node_id)
+        self.remove_nodes_from((node_id,))
+
+    def remove_nodes_from(self, iterable):
+        # The incident edges from the rows of a few nodes, from one pass over the edge list for many
+        node_ids = [node_id for node_id in set(iterable) if self.has_node(node_id)]
+        if not node_ids:
+            return
+        if len(node_ids) < BULK_REMOVAL:
+            keys = set()
+            for node_id in node_ids:
+                keys.update(self.key(node_id, v) for v in self._row(node_id)[0])
+                if self.__directed:
+                    keys.update((u, node_id) for u in self._row(node_id, reverse=True)[0])
+            for key in keys.intersection(self.__added):
+                del self.__added[key]
+        else:
+            self._compile()
+            incident = np.isin(self.__src, node_ids) | np.isin(self.__dst, node_ids)
+            keys = set(zip(self.__src[incident].tolist(), self.__dst[incident].tolist()))
+        self.__removed.update(keys)
+        for key in keys.intersection(self.__edge_data):
+            del self.__edge_data[key]
+        self.__absent.update(node_ids)
+        for node_id in node_ids:
+            self.__node_data.pop(node_id, None)
+        self.__dirty = True
+
+    # -- about edges
+
+    @property
+    def edges(self):
+        return CSREdges(self)
+
+    @property
+    def adj(self):
+        return CSRAdjacency(self)
+
+    def iter_edges(self):
+        src, dst, _ = self.edge_arrays()
+        return zip(src.tolist(), dst.tolist())
+
+    def number_of_edges(self):
+        self._compile()
+        return len(self.__src)
+
+    def _position(self, u, v, offsets, neighbors):
+        # Index of v in the sorted row u, -1 if absent (u added since the arrays were computed included)
+        if not (self.has_node(u) and self.has_node(v)) or u + 1 >= len(offsets):
+            return -1
+        begin, end = offsets[u], offsets[u + 1]
+        i = begin + np.searchsorted(neighbors[begin:end], v)
+        return int(i) if i < end and neighbors[i] == v else -1
+
+    def _find(self, u, v):
+        # Weight of the edge (NaN if absent), None if there is no edge : the pending changes
+        # first, then the arrays as last computed, so that a batch of has_edge / add_edge /
+        # remove_edge calls does not rebuild them
+        if self.__unindexed:
+            self._compile()
+        if not (self.has_node(u) and self.has_node(v)):
+            return None
+        key = self.key(u, v)
+        if key in self.__removed:
+            return None
+        if key in self.__added:
+            return self.__added[key]
+        i = self._position(u, v, self.__offsets, self.__neighbors)
+        return None if i < 0 else float(self.__weights[i])
+
+    def has_edge(self, u, v):
+        return self._find(u, v) is not None
+
+    def weight(self, u, v):
+        w = self._find(u, v)
+        if w is None:
+            raise KeyError((u, v))
+        return self.weight_value(w)
+
+    def edge_data(self, u, v):
+        data = dict(self.__edge_data.get(self.key(u, v), ()))
+        data['weight'] = self.weight(u, v)
+        return data
+
+    def is_weighted(self):
+        self._compile()
+        return len(self.__weight) > 0 and not np.isnan(self.__weight).any()
+
+    def add_edge(self, u, v, weight=None, **data):
+        for node_id in (u, v):
+            if not self.has_node(node_id):
+                self.add_node(node_id)
+        u, v = self.key(u, v)
+        self.__removed.discard((u, v))
+        if self.__int_weights and not int_weights(weight):
+            self.__int_weights = False
+        weight = np.nan if weight is None else float(weight)
+        self.__pending.append((u, v, weight))
+        self.__added[u, v] = weight
+        self.__dirty = True
+        if data:
+            self.__edge_data.setdefault((u, v), {}).update(data)
+
+    def add_edges_from(self, iterable):
+        for edge in iterable:
+            u, v, *args = edge
+            if args and isinstance(args[-1], dict):
+                self.add_edge(u, v, **args[-1])
+            else:
+                self.add_edge(u, v, *args)
+
+    def add_edge_arrays(self, src, dst, weight=None, integers=None):
+        # Bulk insertion of m edges given as arrays, without Python loop over the edges ;
+        # integers : the weights are integers, deduced from weight if None
+        src = np.asarray(src, dtype=np.int32)
+        dst = np.asarray(dst, dtype=np.int32)
+        if self.__int_weights and not (int_weights(weight) if integers is None else integers):
+            self.__int_weights = False
+        weight = np.full(len(src), np.nan) if weight is None else np.asarray(weight, dtype=np.float64)
+        if len(src):
+            last = int(max(src.max(), dst.max()))
+            if last >= self.__n:
+                self.add_node(last)
+            self.__absent.difference_update(np.unique(np.concatenate((src, dst))).tolist())
+        if not self.__directed:
+            src, dst = np.minimum(src, dst), np.maximum(src, dst)
+        if self.__removed:
+            self.__removed.difference_update(zip(src.tolist(), dst.tolist()))
+        self._compile()
+        self.__src = np.concatenate((self.__src, src))
+        self.__dst = np.concatenate((self.__dst, dst))
+        self.__weight = np.concatenate((self.__weight, weight))
+        self.__dirty = True
+        self.__unindexed = True
+
+    def remove_edge(self, u, v):
+        if not self.has_edge(u, v):
+            raise KeyError((u, v))
+        key = self.key(u, v)
+        self.__removed.add(key)
+        self.__added.pop(key, None)
+        self.__edge_data.pop(key, None)
+        self.__dirty = True
+
+    def remove_edges_from(self, iterable):
+        for edge in iterable:
+            u, v = edge[0], edge[1]
+            if self.has_edge(u, v):
+                self.remove_edge(u, v)
+
+    # -- about neighborhood
+
+    def _row(self, node_id, reverse=False):
+        # ([neighbors], [stored weights]) of the successors (predecessors if reverse) : the arrays
+        # as last computed, corrected by the pending changes, so that a removal does not rebuild them
+        if self.__unindexed or len(self.__added) > PENDING_LIMIT:
+            self._compile()
+        if reverse and self.__directed:
+            if self.__reverse is None:
+                self.__reverse = self._csr(self.__dst, self.__src, self.__weight, False)
+            offsets, neighbors, weights = self.__reverse
+        else:
+            offsets, neighbors, weights = self.__offsets, self.__neighbors, self.__weights
+        if node_id + 1 < len(offsets):
+            begin, end = offsets[node_id], offsets[node_id + 1]
+            row = neighbors[begin:end].tolist(), weights[begin:end].tolist()
+        else:
+            row = [], []
+        if not (self.__removed or self.__added):
+            return row
+        removed, added = self.__removed, self.__added
+        key = (lambda u: self.key(u, node_id)) if reverse else (lambda v: self.key(node_id, v))
+        row = [(v, w) for v, w in zip(*row) if key(v) not in removed and key(v) not in added]
+        for (u, v), w in self.__added.items():
+            if reverse and self.__directed:
+                u, v = v, u
+            if u == node_id:
+                row.append((v, w))
+            elif v == node_id and not self.__directed:
+                row.append((u, w))
+        row.sort()
+        return [v for v, _ in row], [w for _, w in row]
+
+    def neighbors(self, node_id):
+        if not self.has_node(node_id):
+            raise KeyError(node_id)
+        return self._row(node_id)[0]
+
+    successors = neighbors
+
+    def weighted_neighbors(self, node_id):
+        # [(neighbor, weight)] read in the arrays, weight None if absent
+        if not self.has_node(node_id):
+            raise KeyError(node_id)
+        weight_value = self.weight_value
+        return [(v, weight_value(w)) for v, w in zip(*self._row(node_id))]
+
+    def predecessors(self, node_id):
+        if not self.has_node(node_id):
+            raise KeyError(node_id)
+        return self._row(node_id, reverse=True)[0]
+
+    def weighted_predecessors(self, node_id):
+        # [(predecessor, weight)] read in the reverse arrays, weight None if absent
+        if not self.has_node(node_id):
+            raise KeyError(node_id)
+        weight_value = self.weight_value
+        return [(u, weight_value(w)) for u, w in zip(*self._row(node_id, reverse=True))]
+
+    def out_degree(self, node_id):
+        self._compile()
+        return int(self.__offsets[node_id + 1] - self.__offsets[node_id])
+
+    def degree(self, node_id):
+        if self.__directed:
+            offsets, _, _ = self.reverse_csr()
+            return self.out_degree(node_id) + int(offsets[node_id + 1] - offsets[node_id])
+        return self.out_degree(node_id)
+
+    def out_edges(self, node_id):
+        return [(node_id, v) for v in self.neighbors(node_id)]
+
+    def in_edges(self, node_id):
+        return [(u, node_id) for u in self.predecessors(node_id)]
@@ -0,0 +1,307 @@
+"""
+dot_view.py
+
+Vues graphviz à état pour pygraph.
+
+Un graphviz.Graph classique ajoute une instruction node / edge à son corps (body) à chaque
+appel : après quelques étapes de Dijkstra ou un scale() sur tous les nœuds, le source DOT
+contient de nombreuses instructions redondantes par élément. Ici chaque nœud et chaque arête
+garde un unique dictionnaire d'attributs courant, fusionné à chaque appel, et le source DOT
+est produit à la demande avec exactement une instruction par élément.
+
+Quand la vue est rattachée à un graphe (members), la liste des éléments vient du modèle :
+un nœud ou une arête aux attributs par défaut (node_attr / edge_attr) n'occupe aucune place
+dans la vue, seuls les attributs qui en diffèrent sont gardés.
+
+Les rendus (pipe, render, affichage Jupyter) passent par le cache partagé RENDER_CACHE :
+une vue dont le source DOT n'a pas changé n'est pas re-rendue.
+"""
+
+import os
+import weakref
+
+import graphviz as gv
+
+from cow import Shared, share, release, own, track
+from render_cache import RENDER_CACHE
+
+
+def copy_states(states):
+    return {key: dict(state) for key, state in states.items()}
+
+
+class DotState:
+    """
+    class DotState est un mixin pour graphviz.Graph / graphviz.Digraph : node() et edge()
+    mettent à jour l'état courant de l'élément au lieu d'écrire dans body.
+
+    Attributes:
+    -----------
+        node_states : dict
+            nom du nœud: dictionnaire de ses attributs DOT (lecture seule, voir own_node_states)
+        edge_states : dict
+            (nom origine, nom destination): dictionnaire des attributs DOT de l'arête ;
+            pour un graphe non orienté (a, b) et (b, a) désignent la même arête
+        boxes : dict
+            'node' / 'edge': boîte Shared des états, rendue quand la vue est détruite
+        source_view : DotState | None
+            pour une vue filtrée (filtered), la vue dont elle partage les états (référence faible)
+        pending : list | None
+            les appels node / edge / remove_* en attente pendant un hold(), None sinon
+        members : object | None
+            fournisseur des éléments (dot_nodes() : couples (nom, attributs de base), dot_edges() :
+            triplets (origine, destination, attributs de base)) ; None : les éléments sont ceux
+            des états. Les états complètent ou remplacent les attributs de base. Gardé par une
+            référence faible : le graphe et sa vue ne forment pas de cycle, une copie abandonnée
+            est libérée (et rend ses boîtes) dès que le compte de références tombe à zéro
+
+    Note:
+    -----
+        body reste disponible pour des lignes DOT brutes, émises avant les éléments.
+        Les états sont partagés en copy-on-write entre une vue et ses copies (copy).
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.boxes = track(self, {'node': Shared({}), 'edge': Shared({})})
+        self.source_view = None
+        self.pending = None
+        self.members = None
+
+    # -- about shared states
+
+    @property
+    def node_box(self):
+        return self.boxes['node']
+
+    @node_box.setter
+    def node_box(self, box):
+        self.boxes['node'] = box
+
+    @property
+    def edge_box(self):
+        return self.boxes['edge']
+
+    @edge_box.setter
+    def edge_box(self, box):
+        self.boxes['edge'] = box
+
+    @property
+    def source_view(self):
+        return None if self.__source_view is None else self.__source_view()
+
+    @source_view.setter
+    def source_view(self, view):
+        self.__source_view = None if view is None else weakref.ref(view)
+
+    @property
+    def members(self):
+        return None if self.__members is None else self.__members()
+
+    @members.setter
+    def members(self, members):
+        self.__members = None if members is None else weakref.ref(members)
+
+    def holder(self):
+        # The view holding the states
+        source_view = self.source_view
+        return self if source_view is None else source_view.holder()
+
+    @property
+    def node_states(self):
+        return self.holder().node_box.value
+
+    @property
+    def edge_states(self):
+        return self.holder().edge_box.value
+
+    def own_node_states(self):
+        # Writable node states : copied first if they are shared with a copy of the view
+        holder = self.holder()
+        holder.node_box = own(holder.node_box, copy_states)
+        return holder.node_box.value
+
+    def own_edge_states(self):
+        holder = self.holder()
+        holder.edge_box = own(holder.edge_box, copy_states)
+        return holder.edge_box.value
+
+    # -- about deferred updates
+
+    def hold(self):
+        # Following node / edge / remove_* calls are only queued
+        if self.pending is None:
+            self.pending = []
+
+    def release(self):
+        # Apply the queued calls in order, once
+        pending, self.pending = self.pending, None
+        for method, args, attrs in pending or ():
+            method(*args, **attrs)
+
+    # -- about state
+
+    def node(self, name, label=None, _attributes=None, **attrs):
+        if self.pending is not None:
+            self.pending.append((self.node, (name, label, _attributes), attrs))
+            return
+        node_states = self.own_node_states()
+        state = node_states.setdefault(name, {})
+        if label is not None:
+            state['label'] = label
+        if _attributes:
+            state.update(_attributes)
+        state.update(attrs)
+        if None in state.values():
+            # None drops an attribute (graphviz skips them) : the base attribute applies again
+            for key in [key for key, value in state.items() if value is None]:
+                del state[key]
+            if not state:
+                del node_states[name]
+
+    @staticmethod
+    def differs(state, label, _attributes, attrs):
+        # Whether merging the attributes into state would change it (None drops an attribute)
+        if label is not None:
+            attrs['label'] = label
+        if _attributes:
+            attrs = {**_attributes, **attrs}
+        state = state or {}
+        return any(state.get(key) != value for key, value in attrs.items())
+
+    def node_differs(self, name, label=None, _attributes=None, **attrs):
+        # False if node(name, ...) would leave the state unchanged ; True while calls are queued
+        return self.pending is not None or self.differs(self.node_states.get(name), label, _attributes, attrs)
+
+    def edge_differs(self, tail_name, head_name, label=None, _attributes=None, **attrs):
+        return self.pending is not None or self.differs(self.edge_state(tail_name, head_name), label, _attributes, attrs)
+
+    def edge_key(self, tail_name, head_name):
+        if not self.directed and (head_name, tail_name) in self.edge_states:
+            return head_name, tail_name
+        return tail_name, head_name
+
+    def edge(self, tail_name, head_name, label=None, _attributes=None, **attrs):
+        if self.pending is not None:
+            self.pending.append((self.edge, (tail_name, head_name, label, _attributes), attrs))
+            return
+        state = self.own_edge_states().setdefault(self.edge_key(tail_name, head_name), {})
+        if label is not None:
+            state['label'] = label
+        if _attributes:
+            state.update(_attributes)
+        state.update(attrs)
+
+    def remove_node(self, name):
+        # The caller removes the incident edges (it knows them from the model)
+        if self.pending is not None:
+            self.pending.append((self.remove_node, (name,), {}))
+            return
+        if name in self.node_states:
+            self.own_node_states().pop(name)
+
+    def remove_edge(self, tail_name, head_name):
+        if self.pending is not None:
+            self.pending.append((self.remove_edge, (tail_name, head_name), {}))
+            return
+        key = self.edge_key(tail_name, head_name)
+        if key in self.edge_states:
+            self.own_edge_states().pop(key)
+
+    def clear(self, keep_attrs=False):
+        super().clear(keep_attrs=keep_attrs)
+        self.pending = [] if self.pending is not None else None
+        holder = self.holder()
+        release(holder.node_box)
+        release(holder.edge_box)
+        holder.node_box = Shared({})
+        holder.edge_box = Shared({})
+
+    def copy(self):
+        view = super().copy()
+        # O(1) : the states are copied by the first of the two views to change them
+        holder = self.holder()
+        view.node_box = share(holder.node_box)
+        view.edge_box = share(holder.edge_box)
+        view.members = self.members
+        return view
+
+    def filtered(self, members):
+        # A view of some elements of this one (see members) : the states are shared, not copied
+        view = super().copy()
+        view.source_view = self
+        view.members = members
+        # Held strongly : the members (a SubgraphView) are often only referenced by this view
+        view.__kept_members = members
+        return view
+
+    # -- about DOT source
+
+    def edge_state(self, tail_name, head_name):
+        return self.edge_states.get(self.edge_key(tail_name, head_name))
+
+    def member_nodes(self, members):
+        # The base attributes given by the members, overridden by the node state
+        for name, base in members.dot_nodes():
+            state = self.node_states.get(name)
+            yield name, {**base, **state} if base and state else state or base
+
+    def member_edges(self, members):
+        # The base attributes given by the members, overridden by the edge state
+        for tail_name, head_name, base in members.dot_edges():
+            state = self.edge_state(tail_name, head_name)
+            yield tail_name, head_name, {**base, **state} if base and state else state or base
+
+    def elements(self):
+        # (node name, state) and (tail name, head name, state) of every element
+        members = self.members
+        if members is None:
+            nodes = self.node_states.items()
+            edges = ((tail_name, head_name, state) for (tail_name, head_name), state in self.edge_states.items())
+            return nodes, edges
+        return self.member_nodes(members), self.member_edges(members)
+
+    def statements(self):
+        nodes, edges = self.elements()
+        for name, state in nodes:
+            yield self._node(self._quote(name), self._attr_list(None, kwargs=state))
+        for tail_name, head_name, state in edges:
+            yield self._edge(tail=self._quote_edge(tail_name), head=self._quote_edge(head_name),
+                             attr=self._attr_list(None, kwargs=state))
+
+    def __iter__(self, subgraph=False):
+        *head, tail = super().__iter__(subgraph=subgraph)
+        yield from head
+        yield from self.statements()
+        yield tail
+
+    # -- about rendering, through the render cache
+
+    def pipe(self, format=None, renderer=None, formatter=None, neato_no_op=None, quiet=False, *, engine=None, encoding=None):
+        if renderer is not None or formatter is not None or neato_no_op is not None:
+            return super().pipe(format, renderer, formatter, neato_no_op, quiet, engine=engine, encoding=encoding)
+        data = RENDER_CACHE.render(self.source, engine or self.engine, format or self.format)
+        return data.decode(encoding) if encoding is not None else data
+
+    def render(self, filename=None, directory=None, view=False, cleanup=False, format=None, renderer=None, formatter=None, **kwargs):
+        if renderer is not None or formatter is not None or kwargs:
+            return super().render(filename, directory, view=view, cleanup=cleanup, format=format,
+                                  renderer=renderer, formatter=formatter, **kwargs)
+        format = format or self.format
+        filepath = self.save(filename, directory)
+        outfile = f'{filepath}.{format}'
+        with open(outfile, 'wb') as file:
+            file.write(self.pipe(format=format))
+        if cleanup:
+            os.remove(filepath)
+        if view:
+            gv.view(outfile)
+        return outfile
+
+
+class DotGraph(DotState, gv.Graph):
+    """Vue non orientée : un graphviz.Graph à état"""
+
+
+class DotDigraph(DotState, gv.Digraph):
+    """Vue orientée : un graphviz.Digraph à état"""
@@ -0,0 +1,26 @@
+"""
+lazy.py
+
+Import différé des dépendances lourdes ou optionnelles (networkx, graphviz, ...) :
+le module retourné n'est réellement exécuté qu'au premier accès à l'un de ses attributs.
+Importer pygraph ou path_finder reste ainsi rapide pour les processus qui n'en utilisent
+qu'une partie (requêtes de chemins sans visualisation par exemple).
+"""
+
+import importlib.util
+import sys
+
+
+def lazy_import(name):
+    """Retourne le module name, chargé au premier accès à un attribut"""
+    if name in sys.modules:
+        return sys.modules[name]
+    spec = importlib.util.find_spec(name)
+    if spec is None:
+        raise ModuleNotFoundError(f"No module named '{name}'", name=name)
+    loader = importlib.util.LazyLoader(spec.loader)
+    spec.loader = loader
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[name] = module
+    loader.exec_module(module)
+    return module
@@ -0,0 +1,104 @@
+"""
+astar.py
+
+A* : Dijkstra guidé vers la destination par une estimation géométrique du coût restant.
+
+Les nœuds positionnés (Graph.position, load_json) ont des coordonnées NodeView.pos, mises
+à l'échelle par NodeView.ech. L'estimation d'un nœud est factor * distance(nœud, end),
+euclidienne ou de Manhattan. Elle est admissible (le chemin trouvé est le plus court)
+tant que factor * distance(u, v) <= poids(u, v) pour chaque arête : par défaut factor est
+le plus grand facteur qui vérifie cette condition.
+"""
+
+from math import hypot, inf
+
+from path_finder.dijkstra import Dijkstra
+
+EUCLIDEAN = 'euclidean'
+MANHATTAN = 'manhattan'
+
+METRICS = {
+    EUCLIDEAN: lambda dx, dy: hypot(dx, dy),
+    MANHATTAN: lambda dx, dy: abs(dx) + abs(dy),
+}
+
+
+class AStar(Dijkstra):
+    """
+    class AStar
+
+    Parameters:
+    -----------
+        graph, start, end, inside, headless :
+            voir Dijkstra ; step, next, seek, solve, diaporama s'utilisent de la même façon
+        heuristic : str
+            EUCLIDEAN ou MANHATTAN
+        factor : float | None
+            coefficient appliqué à la distance géométrique ; None : le plus grand
+            coefficient admissible pour les poids des arêtes (voir admissible_factor)
+
+    Note:
+    -----
+        Un nœud sans position a une estimation nulle.
+    """
+
+    def __init__(self, graph, start=0, end=None, inside=True, headless=False, heuristic=EUCLIDEAN, factor=None):
+        self.__metric = METRICS[heuristic]
+        self.__factor = factor
+        self.__estimates = {}
+        super().__init__(graph, start, end, inside, headless)
+
+    @property
+    def factor(self):
+        if self.__factor is None:
+            self.__factor = self.admissible_factor()
+        return self.__factor
+
+    # -- about the heuristic
+
+    def geometric_distance(self, s1, s2):
+        # Distance between the scaled positions, None if one of them is not positioned
+        store = self.graph.node_store
+        pos1, pos2 = store.pos(s1), store.pos(s2)
+        if pos1 is None or pos2 is None:
+            return None
+        ech1, ech2 = store.ech(s1), store.ech(s2)
+        return self.__metric(pos1[0] * ech1 - pos2[0] * ech2, pos1[1] * ech1 - pos2[1] * ech2)
+
+    def admissible_factor(self):
+        # Largest factor with factor * distance(u, v) <= weight(u, v) for every edge : O(m)
+        factor = inf
+        for s1, s2 in self.graph.edges():
+            distance = self.geometric_distance(s1, s2)
+            if distance:
+                factor = min(factor, self.cost_between(s1, s2) / distance)
+        return 0 if factor == inf else factor
+
+    def heuristic_violations(self, factor=None):
+        # Edges (s1, s2, weight) shorter than their estimate : the heuristic is not admissible
+        factor = self.factor if factor is None else factor
+        violations = []
+        for s1, s2 in self.graph.edges():
+            distance = self.geometric_distance(s1, s2)
+            weight = self.cost_between(s1, s2)
+            if distance is not None and factor * distance > weight:
+                violations.append((s1, s2, weight))
+        return violations
+
+    def is_admissible(self, factor=None):
+        return not self.heuristic_violations(factor)
+
+    def estimate(self, node_id):
+        # Estimated remaining cost from node_id to end
+        estimate = self.__estimates.get(node_id)
+        if estimate is None:
+            distance = self.geometric_distance(node_id, self.end)
+            estimate = self.__estimates[node_id] = 0 if distance is None else self.factor * distance
+        return estimate
+
+    def priority(self, node_id, distance):
+        return distance + self.estimate(node_id)
+
+    def init_dijkstra(self):
+        self.__estimates = {}
+        super().init_dijkstra()
@@ -0,0 +1,148 @@
+"""
+batch.py
+
+Plus courts chemins pour de nombreux couples (start, end), répartis sur des processus.
+
+Construire un Dijkstra par couple modifie la vue du graphe (init_view) : les questions ne
+peuvent pas être traitées en parallèle. Ici le graphe est réduit une fois à un instantané
+CSR (offsets, voisins, poids) de tableaux compacts, envoyé une seule fois à chaque
+processus de travail ; les couples sont regroupés par source et chaque source ne calcule
+qu'un arbre de plus courts chemins. La vue n'est jamais touchée.
+Un graphe en mémoire partagée (Graph.to_shared) n'est pas copié : les processus se
+rattachent à ses blocs.
+"""
+
+import os
+from array import array
+from concurrent.futures import ProcessPoolExecutor
+from math import inf
+
+from lazy import lazy_import
+from path_finder.frontier import Frontier
+from path_finder.sp_cache import shortest_path_tree
+
+shared_graph = lazy_import('shared_graph')
+
+
+def adjacency_snapshot(graph):
+    """
+    Retourne (offsets, voisins, poids) : les successeurs du nœud u sont
+    voisins[offsets[u]:offsets[u + 1]]. Un poids absent vaut 1 (NaN pour le backend csr).
+    """
+    if graph.backend == 'csr':
+        return graph.model.csr()
+    size = max(graph.node_ids(), default=-1) + 1
+    offsets, neighbors, weights = array('q', [0]), array('q'), array('d')
+    present = set(graph.node_ids())
+    for node_id in range(size):
+        if node_id in present:
+            for neighbor, weight in graph.weighted_neighbors(node_id):
+                neighbors.append(neighbor)
+                weights.append(1 if weight is None else weight)
+        offsets.append(len(neighbors))
+    return offsets, neighbors, weights
+
+
+def worker_snapshot(graph):
+    # What the workers load (load_snapshot) : a SharedGraph is pickled as the handle of its blocks
+    return graph if isinstance(graph, shared_graph.SharedGraph) else adjacency_snapshot(graph)
+
+
+def group_by_source(pairs):
+    # {start: [(index of the pair, end)]}
+    groups = {}
+    for index, (start, end) in enumerate(pairs):
+        groups.setdefault(start, []).append((index, end))
+    return groups
+
+
+# -- inside a worker
+
+SNAPSHOT = None # (offsets, neighbors, weights) as lists, or a SharedGraph, set once per process
+
+
+def load_snapshot(snapshot):
+    # Pool initializer : the lists are faster to index than the arrays, a SharedGraph is read in place
+    global SNAPSHOT
+    if isinstance(snapshot, tuple):
+        snapshot = tuple(column.tolist() for column in snapshot) or None
+    SNAPSHOT = snapshot
+
+
+def snapshot_tree(source):
+    # (dist, pred) from source in SNAPSHOT
+    if isinstance(SNAPSHOT, shared_graph.SharedGraph):
+        return shortest_path_tree(SNAPSHOT, source)
+    offsets, neighbors, weights = SNAPSHOT
+    dist = {source: 0}
+    pred = {}
+    locked = set()
+    frontier = Frontier()
+    frontier.push(0, source)
+    while frontier:
+        distance, node_id = frontier.pop()
+        locked.add(node_id)
+        for i in range(offsets[node_id], offsets[node_id + 1]):
+            neighbor, weight = neighbors[i], weights[i]
+            if neighbor in locked:
+                continue
+            path = distance + (1 if weight != weight else weight)
+            if path < dist.get(neighbor, inf):
+                dist[neighbor] = path
+                pred[neighbor] = node_id
+                frontier.push(path, neighbor)
+    return dist, pred
+
+
+def solve_source(task):
+    # [(index, distance, path)] for the pairs of one source
+    source, targets = task
+    dist, pred = snapshot_tree(source)
+    results = []
+    for index, target in targets:
+        if target not in dist:
+            results.append((index, inf, array('q')))
+            continue
+        path = [target]
+        while path[-1] != source:
+            path.append(pred[path[-1]])
+        path.reverse()
+        results.append((index, dist[target], array('q', path)))
+    return results
+
+
+# -- entry point
+
+def shortest_paths_batch(graph, pairs, workers=None):
+    """
+    Retourne (distances, chemins) pour les couples (start, end) de pairs, dans leur ordre :
+    distances est un array('d') (inf si end n'est pas atteignable), chemins une liste
+    d'array('q') [start, ..., end] (vide si end n'est pas atteignable).
+    workers : nombre de processus, os.cpu_count() par défaut ; avec 1 tout est calculé
+    dans le processus courant. graph peut être un SharedGraph (Graph.to_shared).
+
+    >>> distances, paths = shortest_paths_batch(g, [(0, 5), (0, 7), (3, 1)], workers=4)
+    """
+    pairs = list(pairs)
+    for pair in pairs:
+        for node_id in pair:
+            if not graph.model.has_node(node_id):
+                raise KeyError(node_id)
+    tasks = list(group_by_source(pairs).items())
+    snapshot = worker_snapshot(graph)
+    workers = (os.cpu_count() or 1) if workers is None else workers
+    workers = max(1, min(workers, len(tasks)))
+    if workers == 1:
+        load_snapshot(snapshot)
+        groups = list(map(solve_source, tasks))
+        load_snapshot(())
+    else:
+        with ProcessPoolExecutor(workers, initializer=load_snapshot, initargs=(snapshot,)) as pool:
+            groups = list(pool.map(solve_source, tasks, chunksize=max(1, len(tasks) // (4 * workers))))
+    distances = array('d', [inf]) * len(pairs)
+    paths = [None] * len(pairs)
+    for results in groups:
+        for index, distance, path in results:
+            distances[index] = distance
+            paths[index] = path
+    return distances, paths
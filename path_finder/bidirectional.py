@@ -0,0 +1,144 @@
+"""
+bidirectional.py
+
+Dijkstra bidirectionnel pour une question point à point (start, end).
+
+Deux recherches avancent en alternance : l'une depuis start le long des arêtes, l'autre
+depuis end à rebours (les prédécesseurs pour un DiGraph). Chaque arête relâchée vers un
+nœud déjà atteint par l'autre recherche propose un chemin complet ; le meilleur, de coût
+mu, est le plus court dès que la somme des deux plus petites priorités des frontières
+atteint mu. Chaque recherche ne couvre alors qu'un disque de rayon environ mu / 2.
+"""
+
+from math import inf
+
+from path_finder.frontier import Frontier
+
+
+class BidirectionalDijkstra:
+    """
+    class BidirectionalDijkstra
+
+    Parameters:
+    -----------
+        graph : Graph
+            le graphe sur lequel on applique l'algorithme
+        start : int
+            le nœud de départ
+        end : int
+            le nœud de destination, le plus grand numéro de nœud par défaut
+
+    Note:
+    -----
+        La résolution ne touche pas la vue. solve() retourne le chemin dans le même ordre
+        que Dijkstra.solve(headless=True) : [end, ..., start], [] si end n'est pas
+        atteignable ; shortest_cost() vaut alors inf. Un poids absent (None) compte pour 1.
+    """
+
+    def __init__(self, graph, start=0, end=None):
+        self.__graph = graph
+        self.__start = start
+        self.__end = end if end is not None else max(graph.node_ids())
+        self.__solved = False
+        self.__shortest_path = list()
+        self.__cost = inf
+        self.__meeting = None # Node of the best path found by both searches
+        # Forward (0) and backward (1) searches : distances, predecessors, locked nodes, frontiers
+        self.__dist = ({self.__start: 0}, {self.__end: 0})
+        self.__pred = ({}, {})
+        self.__locked = (set(), set())
+        self.__frontiers = (Frontier(), Frontier())
+        self.__frontiers[0].push(0, self.__start)
+        self.__frontiers[1].push(0, self.__end)
+
+    @property
+    def graph(self):
+        return self.__graph
+
+    @property
+    def start(self):
+        return self.__start
+
+    @property
+    def end(self):
+        return self.__end
+
+    @property
+    def solved(self):
+        return self.__solved
+
+    @property
+    def shortest_path(self):
+        return self.__shortest_path
+
+    def settled_count(self):
+        # Number of locked nodes of both searches : the work done
+        return len(self.__locked[0]) + len(self.__locked[1])
+
+    # -- about the searches
+
+    def _edges(self, side, node_id):
+        if side == 0:
+            return self.__graph.weighted_neighbors(node_id)
+        return self.__graph.weighted_predecessors(node_id)
+
+    def _should_stop(self):
+        forward, backward = self.__frontiers
+        if not forward or not backward:
+            return True
+        return forward.peek()[0] + backward.peek()[0] >= self.__cost
+
+    def _step(self):
+        # Lock the closest node of the smallest frontier and relax its edges
+        side = 0 if len(self.__frontiers[0]) <= len(self.__frontiers[1]) else 1
+        dist, pred, locked = self.__dist[side], self.__pred[side], self.__locked[side]
+        other = self.__dist[1 - side]
+        distance, node_id = self.__frontiers[side].pop()
+        locked.add(node_id)
+        for neighbor, weight in self._edges(side, node_id):
+            if neighbor in locked:
+                continue
+            path = distance + (1 if weight is None else weight)
+            if path < dist.get(neighbor, inf):
+                dist[neighbor] = path
+                pred[neighbor] = node_id
+                self.__frontiers[side].push(path, neighbor)
+            if neighbor in other and path + other[neighbor] < self.__cost:
+                self.__cost = path + other[neighbor]
+                self.__meeting = neighbor
+
+    def run(self):
+        if self.__start == self.__end:
+            self.__cost, self.__meeting = 0, self.__start
+        while not self._should_stop():
+            self._step()
+        self.__solved = True
+        return self.bidirectional_path()
+
+    def bidirectional_path(self):
+        # [end, ..., start] through the meeting node, [] if end is not reachable
+        self.__shortest_path = list()
+        if self.__meeting is None:
+            return self.__shortest_path
+        forward, backward = self.__pred
+        pos = self.__meeting
+        while pos != self.__end:
+            pos = backward[pos]
+            self.__shortest_path.append(pos)
+        self.__shortest_path.reverse()
+        pos = self.__meeting
+        while pos != self.__start:
+            self.__shortest_path.append(pos)
+            pos = forward[pos]
+        self.__shortest_path.append(pos)
+        return self.__shortest_path
+
+    def solve(self):
+        if not self.__solved:
+            self.run()
+        return self.__shortest_path
+
+    def shortest_cost(self):
+        # Length of the shortest path, inf if end is not reachable
+        self.solve()
+        return self.__cost
@@ -0,0 +1,315 @@
+"""
+contraction.py
+
+Hiérarchie de contraction (contraction hierarchies) : un index construit une fois pour
+répondre à de nombreuses questions point à point sur un graphe qui ne change pas.
+
+Construction : les nœuds sont contractés un par un, du moins au plus important (différence
+d'arêtes : raccourcis ajoutés moins arêtes retirées, plus les voisins déjà contractés).
+Contracter v relie chaque couple (u, x) de ses voisins non contractés par un raccourci
+u -> x de poids w(u, v) + w(v, x), sauf si une recherche locale (témoin) trouve un chemin
+au plus aussi court qui évite v. Le rang d'un nœud est son ordre de contraction.
+
+Question : deux recherches de Dijkstra qui ne montent que vers des rangs supérieurs, l'une
+depuis start dans le graphe montant, l'autre depuis end dans le graphe descendant
+(arêtes prises à rebours). Elles ne visitent que quelques centaines de nœuds ; les
+raccourcis du chemin trouvé sont ensuite dépliés en nœuds du graphe d'origine.
+
+L'index se sauvegarde sur disque (save / load). Il devient périmé dès que les sommets,
+les arêtes ou les poids du graphe changent (Graph.model_version) : hierarchy_for(graph)
+en reconstruit alors un nouveau.
+"""
+
+import hashlib
+import pickle
+from math import inf
+from weakref import WeakKeyDictionary, ref
+
+from path_finder.frontier import Frontier
+
+WITNESS_SETTLED_LIMIT = 64 # Nodes settled by a witness search before giving up (a shortcut is added)
+
+
+def edge_weights(graph):
+    # ({u: {v: weight}}, {v: {u: weight}}) : successors and predecessors, the lightest of parallel edges
+    out = {node_id: {} for node_id in graph.node_ids()}
+    into = {node_id: {} for node_id in out}
+    for u in out:
+        for v, weight in graph.weighted_neighbors(u):
+            weight = 1 if weight is None else weight
+            if u != v and weight < out[u].get(v, inf):
+                out[u][v] = into[v][u] = weight
+    return out, into
+
+
+def fingerprint(graph, out=None):
+    """
+    Empreinte des nœuds, des arêtes et des poids de graph (ou de ses successeurs out, voir
+    edge_weights) : vérifie qu'un index chargé lui correspond
+    """
+    if out is None:
+        out, _ = edge_weights(graph)
+    digest = hashlib.sha1()
+    for u in sorted(out):
+        digest.update(repr((u, sorted(out[u].items()))).encode())
+    return digest.hexdigest()
+
+
+class ContractionHierarchy:
+    """
+    class ContractionHierarchy
+
+    Parameters:
+    -----------
+        graph : Graph
+            le graphe indexé (Graph, DiGraph ou SharedGraph) ; un poids absent compte pour 1.
+            Il est gardé par une référence faible : l'index est périmé une fois le graphe détruit
+        witness_limit : int
+            nœuds verrouillés par une recherche de témoin avant d'abandonner : plus petit,
+            la construction est plus rapide mais ajoute plus de raccourcis
+
+    Attributes:
+    -----------
+        ranks : dict
+            node_id: ordre de contraction
+        up : dict
+            node_id: [(node_id de rang supérieur, poids)], arêtes et raccourcis sortants
+        down : dict
+            node_id: [(node_id de rang supérieur, poids)], arêtes et raccourcis entrants
+        middles : dict
+            (u, x): nœud contracté v du raccourci u -> x = u -> v -> x ; pour un graphe non
+            orienté, chaque raccourci y est dans les deux sens
+    """
+
+    def __init__(self, graph, witness_limit=WITNESS_SETTLED_LIMIT):
+        self.__graph = ref(graph)
+        self.__model_version = graph.model_version
+        self.__directed = graph.model.is_directed()
+        self.witness_limit = witness_limit
+        self.ranks = {}
+        self.up = {}
+        self.down = {}
+        self.middles = {}
+        self.fingerprint = None # Of the graph indexed by build()
+        self.settled = 0 # Nodes settled by the last query
+        self.build()
+
+    @property
+    def graph(self):
+        # None once the graph is collected
+        return self.__graph()
+
+    @property
+    def model_version(self):
+        return self.__model_version
+
+    def is_stale(self):
+        # The graph changed since the index was built
+        graph = self.graph
+        return graph is None or graph.model_version != self.__model_version
+
+    def shortcuts_count(self):
+        return len(self.middles)
+
+    # -- about preprocessing
+
+    def witness_distances(self, out, source, avoided, targets, limit):
+        # Distances from source avoiding the node avoided, exact for the targets settled
+        # before limit (in length) or witness_limit (in settled nodes)
+        dist = {source: 0}
+        targets = set(targets)
+        frontier = Frontier()
+        frontier.push(0, source)
+        settled = 0
+        while frontier and targets and settled < self.witness_limit:
+            distance, node_id = frontier.pop()
+            if distance > limit:
+                break
+            targets.discard(node_id)
+            settled += 1
+            for neighbor, weight in out[node_id].items():
+                path = distance + weight
+                if neighbor != avoided and path <= limit and path < dist.get(neighbor, inf):
+                    dist[neighbor] = path
+                    frontier.push(path, neighbor)
+        return dist
+
+    def shortcuts(self, out, into, node_id):
+        # [(u, x, weight)] needed to contract node_id in the remaining graph (out, into) :
+        # one witness search from each u for all the x
+        shortcuts = []
+        for u, w1 in into[node_id].items():
+            targets = {x: w1 + w2 for x, w2 in out[node_id].items() if x != u}
+            if not targets:
+                continue
+            dist = self.witness_distances(out, u, node_id, targets, max(targets.values()))
+            shortcuts.extend((u, x, weight) for x, weight in targets.items() if dist.get(x, inf) > weight)
+        return shortcuts
+
+    def importance(self, out, into, node_id, contracted_neighbors):
+        # Edge difference plus the contracted neighbors : contracted first when small
+        removed = len(out[node_id]) + len(into[node_id])
+        return len(self.shortcuts(out, into, node_id)) - removed + contracted_neighbors.get(node_id, 0)
+
+    def build(self):
+        # Contract every node in order of importance, lazily updated
+        out, into = edge_weights(self.graph)
+        self.fingerprint = fingerprint(self.graph, out)
+        ups = {node_id: dict(edges) for node_id, edges in out.items()}
+        contracted_neighbors = {}
+        order = Frontier()
+        for node_id in out:
+            order.push((self.importance(out, into, node_id, contracted_neighbors), node_id), node_id)
+        while order:
+            (_, node_id), _ = order.pop()
+            priority = self.importance(out, into, node_id, contracted_neighbors)
+            if order and (priority, node_id) > order.peek()[0]:
+                order.push((priority, node_id), node_id)
+                continue
+            for u, x, weight in self.shortcuts(out, into, node_id):
+                # Undirected : both directions, the witness searches from u and from x may differ
+                for a, b in ((u, x),) if self.__directed else ((u, x), (x, u)):
+                    out[a][b] = into[b][a] = weight
+                    ups[a][b] = weight
+                    self.middles[a, b] = node_id
+            self.ranks[node_id] = len(self.ranks)
+            for neighbor in set(out[node_id]).union(into[node_id]):
+                out[neighbor].pop(node_id, None)
+                into[neighbor].pop(node_id, None)
+                contracted_neighbors[neighbor] = contracted_neighbors.get(neighbor, 0) + 1
+            del out[node_id], into[node_id]
+        # Every edge (original or shortcut) goes up from its lower ranked end
+        self.up = {node_id: [] for node_id in self.ranks}
+        self.down = {node_id: [] for node_id in self.ranks}
+        for u, edges in ups.items():
+            for x, weight in edges.items():
+                if self.ranks[u] < self.ranks[x]:
+                    self.up[u].append((x, weight))
+                else:
+                    self.down[x].append((u, weight))
+        if not self.__directed:
+            # Both directions of each edge and shortcut were added : the two graphs are the same
+            self.down = self.up
+
+    # -- about queries
+
+    def check(self, *node_ids):
+        if self.is_stale():
+            raise ValueError('the graph changed since the contraction hierarchy was built')
+        for node_id in node_ids:
+            if node_id not in self.ranks:
+                raise KeyError(node_id)
+
+    def upward_search(self, start, end):
+        # (distance, meeting node, forward predecessors, backward predecessors)
+        dists, preds = ({start: 0}, {end: 0}), ({}, {})
+        frontiers = (Frontier(), Frontier())
+        frontiers[0].push(0, start)
+        frontiers[1].push(0, end)
+        best, meeting = (0, start) if start == end else (inf, None)
+        self.settled = 0
+        while True:
+            # The closest side first ; done when neither can find anything shorter than best
+            tops = [frontier.peek()[0] if frontier else inf for frontier in frontiers]
+            side = 0 if tops[0] <= tops[1] else 1
+            if tops[side] >= best:
+                break
+            distance, node_id = frontiers[side].pop()
+            self.settled += 1
+            dist, other = dists[side], dists[1 - side]
+            if node_id in other and distance + other[node_id] < best:
+                best, meeting = distance + other[node_id], node_id
+            for neighbor, weight in (self.up if side == 0 else self.down)[node_id]:
+                path = distance + weight
+                if path < dist.get(neighbor, inf):
+                    dist[neighbor] = path
+                    preds[side][neighbor] = node_id
+                    frontiers[side].push(path, neighbor)
+        return best, meeting, preds[0], preds[1]
+
+    def unpack(self, u, x):
+        # [u, ..., x] : the edge u -> x with its shortcuts replaced by original edges
+        path, stack = [u], [(u, x)]
+        while stack:
+            u, x = stack.pop()
+            middle = self.middles.get((u, x))
+            if middle is None:
+                path.append(x)
+            else:
+                stack.append((middle, x))
+                stack.append((u, middle))
+        return path
+
+    def distance(self, start, end):
+        # Length of the shortest path, inf if end is not reachable
+        self.check(start, end)
+        return self.upward_search(start, end)[0]
+
+    def path(self, start, end):
+        # [start, ..., end] in original node ids, [] if end is not reachable
+        self.check(start, end)
+        best, meeting, forward, backward = self.upward_search(start, end)
+        if meeting is None:
+            return []
+        nodes = [meeting]
+        while nodes[-1] != start:
+            nodes.append(forward[nodes[-1]])
+        nodes.reverse()
+        while nodes[-1] != end:
+            nodes.append(backward[nodes[-1]])
+        path = [start]
+        for u, x in zip(nodes, nodes[1:]):
+            path.extend(self.unpack(u, x)[1:])
+        return path
+
+    # -- about files
+
+    def save(self, filename):
+        """
+        Sauvegarde l'index et l'empreinte du graphe indexé, prise à la construction (voir load).
+        Lève ValueError si le graphe a changé depuis.
+        """
+        self.check()
+        index = {
+            'directed': self.__directed,
+            'fingerprint': self.fingerprint,
+            'witness_limit': self.witness_limit,
+            'ranks': self.ranks,
+            'up': self.up,
+            'down': self.down,
+            'middles': self.middles,
+        }
+        with open(filename, 'wb') as file:
+            pickle.dump(index, file, pickle.HIGHEST_PROTOCOL)
+
+    @classmethod
+    def load(cls, filename, graph):
+        """
+        Retourne l'index sauvegardé par save pour graph, sans le reconstruire.
+        Lève ValueError si graph n'a plus les nœuds, arêtes et poids indexés.
+        """
+        with open(filename, 'rb') as file:
+            index = pickle.load(file)
+        if index['fingerprint'] != fingerprint(graph):
+            raise ValueError(f'{filename} does not index this graph (nodes, edges or weights differ)')
+        hierarchy = cls.__new__(cls)
+        hierarchy.__graph = ref(graph)
+        hierarchy.__model_version = graph.model_version
+        hierarchy.__directed = index['directed']
+        hierarchy.witness_limit = index['witness_limit']
+        hierarchy.ranks, hierarchy.up, hierarchy.down = index['ranks'], index['up'], index['down']
+        hierarchy.middles = index['middles']
+        hierarchy.fingerprint = index['fingerprint']
+        hierarchy.settled = 0
+        return hierarchy
+
+
+HIERARCHIES = WeakKeyDictionary() # graph: ContractionHierarchy
+
+
+def hierarchy_for(graph):
+    """Retourne la hiérarchie de contraction de graph, reconstruite si le graphe a changé"""
+    hierarchy = HIERARCHIES.get(graph)
+    if hierarchy is None or hierarchy.is_stale():
+        hierarchy = HIERARCHIES[graph] = ContractionHierarchy(graph)
+    return hierarchy
@@ -1,11 +1,19 @@
-from queue import PriorityQueue
 from constantes import *
+from path_finder.frontier import Frontier
+from path_finder.replay import DijkstraReplay, SELECT, RELAX, LOCK
+from path_finder.sp_cache import cache_for
+from render_cache import RENDER_CACHE
 import os
-from tkinter import Tk, filedialog
-import shutil
-import graphviz as gv
+import base64
+import json
 from math import inf
-import networkx as nx
+
+# tkinter and shutil are imported by the exports
+
+# Ressources of the html export (css, js, arrows), next to the package
+RES_DIRECTORY = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'res')
+# Node attributes sent to the page by a delta export
+DELTA_ATTRIBUTES = ('fillcolor', 'fontcolor', 'label', 'xlabel')
 
 class Dijkstra:
     """
@@ -33,13 +41,18 @@ class Dijkstra:
             collection des nœud visité   
         locked : collection set
             collection des nœuds verrouillés      
+        headless : bool
+            si True la vue n'est pas initialisée : la résolution ne touche que le modèle,
+            la vue n'est préparée qu'au premier affichage d'une étape (seek, next, diaporama)
     
     Note:
     -----
         Les autres paramètres ne devraient pas être utilisés : ils servent à l'exécution de l'algorithme.
+        Chaque étape est enregistrée dans un journal d'événements (select, relax, lock) :
+        afficher une étape déjà calculée ne relance pas l'algorithme.
     """
     
-    def __init__(self, graph, start=0, end=None, inside=True):
+    def __init__(self, graph, start=0, end=None, inside=True, headless=False):
         self.__graph = graph # Graphe 
         self.__start = start # Nœud de départ
         self.__end = end if end is not None else max(graph.node_ids()) # Nœud de destination
@@ -51,9 +64,13 @@ class Dijkstra:
         self.__locked = set() # Nœuds verrouillés
         self.__selected = self.__start
         self.__temp = set() # Tool for neighboor
-        self.__first_step = True
-        self.__priority_queue = PriorityQueue()
+        self.__frontier = Frontier() # Nœuds atteints, non verrouillés
         self.__inside = inside
+        self.__headless = headless
+        self.__events = [] # Journal : (SELECT, node, dist), (RELAX, node, pred, dist), (LOCK, node)
+        self.__steps = [] # Indice dans events du début de chaque étape
+        self.__cursor = None # Étape affichée par next()
+        self.__view_ready = False
         self.init_dijkstra()
    
     # +++++GET/SET+++++ #
@@ -89,6 +106,17 @@ class Dijkstra:
     @property
     def solved(self):
         return self.__solved        
+
+    @property
+    def events(self):
+        return self.__events
+
+    def steps_count(self):
+        return len(self.__steps)
+
+    def settled_count(self):
+        # Number of locked nodes : the work done by the search
+        return len(self.__locked)
     
     
     # +++++TOOLS+++++ #    
@@ -96,86 +124,140 @@ class Dijkstra:
         return self.graph.view
     
     def show_shortest_path(self):
-        # Show the shortest path without other path
-        Gtemp = self.graph.copy()
-        nodeList = list(self.graph.model.nodes)
-        res = list(self.graph.model.nodes)
-        for i in range(len(nodeList)):
-            for x in range(len(self.__shortest_path)):
-                if nodeList[i] == self.__shortest_path[x]:
-                    res.remove(self.__shortest_path[x])
-        for i in range(len(res)):
-            Gtemp.remove_node(res[i])
-        return Gtemp.view
+        # Show the shortest path without other path : a view of the graph filtered on its nodes
+        return self.graph.subgraph_view(self.__shortest_path).view
     
     def make_section(self, title, img):
         h1 = f"<div id=container_title><h1>{title}</h1></div>"
         img = f"<img src='{img}'>"
         inner_body = f"<div class='slide'>{h1}{img}</div>"
         return inner_body
+
+    def make_inline_section(self, title, svg):
+        # Same slide with the svg markup itself instead of a link to the image
+        h1 = f"<div id=container_title><h1>{title}</h1></div>"
+        svg = svg[svg.find("<svg"):]
+        return f"<div class='slide'>{h1}{svg}</div>"
     
-    def diaporama(self, filename="index"):
-        header = "<html>\n<head>\n<title>Dijkstra</title>\n<link rel='stylesheet' href='css/css.css'>\n</head>\n<body>\n<div class='diapo'>\n<div class='elements'>"
-        footer = "</div><img src=img/left.svg id='nav-gauche'>\n\
-                  <img src=img/right.svg id='nav-droite'></div>\n<script src='js/script.js'></script></body>\n</html>"
-        html = ""
-        
+    def frame_sources(self):
+        # DOT source of every recorded step, then of the shortest path ; the model is solved once
+        self.run()
+        sources = []
+        for i in range(len(self.__steps) + 1):
+            self.seek(i)
+            sources.append(self.view().source)
+        self.color_dijkstra_path()
+        sources.append(self.view().source)
+        return sources
+
+    def node_deltas(self, node_ids):
+        # {node name: its fill color, font color and labels} read from the view state
+        states = self.view().node_states
+        return {str(node_id): {key: value for key, value in states.get(str(node_id), {}).items() if key in DELTA_ATTRIBUTES}
+                for node_id in node_ids}
+
+    def delta_frames(self):
+        # Base DOT source (step 0), then the changes of every following frame, taken from the events log
+        self.run()
+        self.seek(0)
+        base = self.view().source
+        deltas = []
+        for i in range(1, len(self.__steps) + 1):
+            deltas.append(self.node_deltas(self.__replay.show(i)))
+        self.color_dijkstra_path()
+        deltas.append(self.node_deltas(self.graph.node_ids()))
+        return base, deltas
+
+    def export_diaporama(self, output_dir, filename="index", inline=False, workers=None, delta=False):
+        """
+        Exporte sans interaction l'animation de la résolution dans output_dir/filename.html
+        et retourne le chemin de la page.
+        Les ressources (css, js, flèches) sont prises dans le dossier res du paquet ; avec
+        inline=True la page est un unique fichier autonome (SVG, css et js intégrés),
+        sinon les images sont écrites dans output_dir/img comme pour diaporama().
+        Avec delta=True le graphe n'est rendu qu'une fois : chaque étape suivante est un
+        petit dictionnaire nœud: couleur / étiquettes appliqué par script.js.
+        """
+        with open(os.path.join(RES_DIRECTORY, 'css.css'), encoding="utf-8") as css_file:
+            css = css_file.read()
+        with open(os.path.join(RES_DIRECTORY, 'script.js'), encoding="utf-8") as js_file:
+            script = js_file.read()
+        import shutil
+        for folder in (("",) if inline else ("", "css", "js", "img")):
+            os.makedirs(os.path.join(output_dir, folder), exist_ok=True)
+        if delta:
+            base, deltas = self.delta_frames()
+            sources, images = [], []
+        else:
+            # Collect every frame first, then render them concurrently (workers graphviz processes)
+            sources = self.frame_sources()
+            images = RENDER_CACHE.render_many(sources, self.view().engine, 'svg', workers)
+        html_path = os.path.join(output_dir, filename + ".html")
+        with open(html_path, "w", encoding="utf-8") as page:
+            if inline:
+                page.write(f"<html>\n<head>\n<title>Dijkstra</title>\n<style>\n{css}</style>\n</head>\n<body>\n<div class='diapo'>\n<div class='elements'>")
+            else:
+                page.write("<html>\n<head>\n<title>Dijkstra</title>\n<link rel='stylesheet' href='css/css.css'>\n</head>\n<body>\n<div class='diapo'>\n<div class='elements'>")
+            if delta:
+                page.write(self.make_inline_section("Step : 0", RENDER_CACHE.render(base, self.view().engine, 'svg').decode("utf-8")))
+                page.write("<script type='application/json' id='delta-steps'>" + json.dumps(deltas).replace("</", "<\\/") + "</script>")
+            for i, (source, image) in enumerate(zip(sources, images)):
+                if inline:
+                    page.write(self.make_inline_section("Step : "+str(i), image.decode("utf-8")))
+                    continue
+                with open(os.path.join(output_dir, "img", str(i)), "w", encoding="utf-8") as dot_file:
+                    dot_file.write(source)
+                with open(os.path.join(output_dir, "img", str(i)+".svg"), "wb") as svg_file:
+                    svg_file.write(image)
+                page.write(self.make_section("Step : "+str(i), str("img/"+str(i)+".svg")))
+            if inline:
+                left, right = (self.data_uri(os.path.join(RES_DIRECTORY, name)) for name in ('left.svg', 'right.svg'))
+                page.write(f"</div><img src='{left}' id='nav-gauche'>\n<img src='{right}' id='nav-droite'></div>\n<script>\n{script}</script></body>\n</html>")
+            else:
+                page.write("</div><img src=img/left.svg id='nav-gauche'>\n<img src=img/right.svg id='nav-droite'></div>\n<script src='js/script.js'></script></body>\n</html>")
+        if not inline:
+            shutil.copyfile(os.path.join(RES_DIRECTORY, 'left.svg'), os.path.join(output_dir, "img", "left.svg"))
+            shutil.copyfile(os.path.join(RES_DIRECTORY, 'right.svg'), os.path.join(output_dir, "img", "right.svg"))
+            shutil.copyfile(os.path.join(RES_DIRECTORY, 'css.css'), os.path.join(output_dir, "css", "css.css"))
+            shutil.copyfile(os.path.join(RES_DIRECTORY, 'script.js'), os.path.join(output_dir, "js", "script.js"))
+        return html_path
+
+    def data_uri(self, svg_path):
+        with open(svg_path, "rb") as svg_file:
+            return "data:image/svg+xml;base64," + base64.b64encode(svg_file.read()).decode("ascii")
+
+    def diaporama(self, filename="index", workers=None):
+        # Ask for a folder, then export in folder/exported
+        from tkinter import Tk, filedialog
         root = Tk() 
         root.withdraw() 
         root.attributes('-topmost', True) 
         open_file = filedialog.askdirectory() 
-        directory = os.getcwd()
-        
-        filename = open_file+"/exported/"+filename + ".html"
-        if not os.path.exists(open_file+"/exported/css"):
-            os.makedirs(open_file+"/exported/css")
-        if not os.path.exists(open_file+"/exported/js"):
-            os.makedirs(open_file+"/exported/js")
-        i = 0
-            
-        while self.__solved != True:
-            self.next()
-            self.__graph.write(open_file+"/exported/img/"+str(i), view=False)
-            if os.path.exists(str(i)):
-                os.remove(str(i))
-            header += self.make_section("Step : "+str(i), str("img/"+str(i)+".svg"))
-            i += 1
-        if self.__solved:
-            self.dijkstra_path()
-            self.color_dijkstra_path()
-            self.__graph.write(open_file+"/exported/img/"+str(i), view=False)
-            header += self.make_section("Step : "+str(i), str("img/"+str(i)+".svg"))
-        shutil.copyfile(directory +'/res/left.svg', open_file+"/exported/img/"+"left.svg")
-        shutil.copyfile(directory +'/res/right.svg', open_file+"/exported/img/"+"right.svg")
-        shutil.copyfile(directory +'/res/css.css', open_file+"/exported/css/"+"css.css")
-        shutil.copyfile(directory +'/res/script.js', open_file+"/exported/js/"+"script.js")
-        html = html+header+footer
-        page = open(filename,"w")
-        page.write(html)                    
-        page.close()
+        return self.export_diaporama(open_file+"/exported", filename, workers=workers)
         
     # +++++TOOLS+++++ #   
     
-    # +++++NETWORKX+++++ #               
+    # +++++SHORTEST PATH TREES+++++ #
+    # answered by the memoized shortest-path trees of the graph (sp_cache) : [] / inf when unreachable
     def path(self, src_node_id, dst_node_id):
-        # Dijkstra : shortest weighted path, by networkx
-        return nx.dijkstra_path(self.graph.model, src_node_id, dst_node_id)
+        # Dijkstra : shortest weighted path
+        return cache_for(self.graph).path(src_node_id, dst_node_id)
 
     def path_length(self, src_node_id, dst_node_id):
-        # Dijkstra : Distance between 2 entry node : start , end, by networkx
-        return nx.dijkstra_path_length(self.graph.model, src_node_id, dst_node_id)
+        # Dijkstra : Distance between 2 entry node : start , end
+        return cache_for(self.graph).distance(src_node_id, dst_node_id)
     
     def distance_nx(self, dst_node_id):
-        # Dijkstra : Distance between start and an entry node, by networkx
-        return nx.dijkstra_path_length(self.graph.model, self.start, dst_node_id)
+        # Dijkstra : Distance between start and an entry node
+        return cache_for(self.graph).distance(self.start, dst_node_id)
     
     def distance(self, dst_node_id):
         return self.__dist[dst_node_id]
     
     def shortest_cost(self):
-        # Dijkstra : Lenght of the shortest path by networkx
-        return nx.dijkstra_path_length(self.graph.model, self.start, self.end)
-    # +++++NETWORKX+++++ #    
+        # Dijkstra : Lenght of the shortest path
+        return cache_for(self.graph).distance(self.start, self.end)
+    # +++++SHORTEST PATH TREES+++++ #    
     
         
     # ------------------------Dijkstra---------------------# 
@@ -185,22 +267,28 @@ class Dijkstra:
         self.__pred = {}  # Predecessor of the current node pos
         self.__dist = {node_id: inf for node_id in self.graph.node_ids()} # Init all nodes dist to inf except the source_node
         self.__dist[self.start] = 0  # dist from start -> start is zero
-        self.__priority_queue.put((self.__dist[self.start], self.start))
+        self.__frontier.push(self.priority(self.start, 0), self.start)
         self.__selected = self.__start
+        self.__replay = DijkstraReplay(self.graph, self.start, self.__events, self.__steps, self.__inside)
+        if not self.__headless:
+            self.init_view()
+
+    def init_view(self):
         self.graph.color_on(self.start, 3)
         self.graph.resize(0.45)
-        # Labelise all node 
-        stre = str()
-        for i in LETTERS:
-            if len(stre) <= self.graph.number_of_nodes():
-                stre += i
-        self.graph.set_labels(stre)
+        # Labelise all node when there are enough letters, keep the ids otherwise
+        last_id = max(self.graph.node_ids(), default=0)
+        if last_id < len(LETTERS):
+            self.graph.set_labels(LETTERS[:last_id + 1])
         self.graph.label_on()
-        print(self.__dist)
+        self.__view_ready = True
     # +++++INIT+++++ #
     
     # +++++TOOLS+++++ #
     def dijkstra_path(self):
+        self.__shortest_path = list()
+        if self.__dist.get(self.end, inf) == inf:
+            return self.__shortest_path
         pos = self.end
         while pos != self.start:
             self.__shortest_path.append(pos)
@@ -217,114 +305,94 @@ class Dijkstra:
                 self.graph.color_on(self.__shortest_path[i], 5)
             else :
                 self.graph.color_on(self.__shortest_path[i], 2)
+        self.__replay.invalidate()
     
     def cost_between(self, start, end):
-        # Return :Weight between 2 nodes
-        return self.graph.edge_view(start, end).weight
+        # Return :Weight between 2 nodes, read from the model (networkx or csr)
+        return self.graph.edge_informations(start, end)['weight']
     
     def reset_dijkstra(self):
         # Reset dijkstra & view
         self.graph.reset_view()
-        self.__step = False
         self.__solved = False
-        self.__step_by_step = False
         self.__shortest_path = list() # Path to use
         self.__dist = None
         self.__pred = None
         self.__selected = None
-        self.__first_step = True
         self.__visited = set()
         self.__locked = set()
-        self.__priority_queue = PriorityQueue() 
+        self.__temp = set()
+        self.__frontier = Frontier()
+        self.__events = []
+        self.__steps = []
+        self.__cursor = None
+        self.__view_ready = False
         self.init_dijkstra()
+    def priority(self, node_id, distance):
+        # Key of node_id in the frontier : its distance ; AStar adds an estimate of the remaining cost
+        return distance
     # +++++TOOLS+++++ #
     
+    def _step(self):
+        # Dijkstra : one step on the model only, recorded in the events log, the view is not touched
+        _, pos = self.__frontier.pop()
+        pos_weight = self.__dist[pos]
+        self.__selected = pos
+        self.__visited.add(pos)
+        self.__steps.append(len(self.__events))
+        self.__events.append((SELECT, pos, pos_weight))
+        self.__temp = set()
+        for neighbor in self.graph.neighbors(pos):
+            if neighbor not in self.__locked:
+                self.__temp.add(neighbor)
+                path = pos_weight + self.cost_between(pos, neighbor)
+                if path < self.__dist[neighbor]:
+                    self.__dist[neighbor] = path
+                    self.__pred[neighbor] = pos
+                    self.__frontier.push(self.priority(neighbor, path), neighbor) # Decrease key : O(log n)
+                    self.__events.append((RELAX, neighbor, pos, path))
+        self.__locked.add(pos)
+        self.__events.append((LOCK, pos))
+        if not self.__frontier or self.end in self.__locked:
+            self.__solved = True
+        return len(self.__steps)
+
+    def run(self):
+        # Dijkstra : headless resolution, only the model and the events log are updated
+        while not self.solved:
+            self._step()
+        return self.dijkstra_path()
+
+    def seek(self, step):
+        # Show the state after `step` steps ; missing steps are computed headless, known ones are replayed
+        while len(self.__steps) < step and not self.solved:
+            self._step()
+        if not self.__view_ready:
+            self.init_view()
+        self.__replay.show(step)
+        return self.view()
+
     def dijkstra_step(self):
         # Dijkstra :step , Found the best path, save attributes{dist, pred, visited, shortest_path}
-            pos_weight, pos = self.__priority_queue.get()
-            self.__selected = pos
-            for neighbor in self.graph.neighbors(pos):
-                if neighbor not in self.__locked:
-                    path = pos_weight + self.cost_between(pos, neighbor)
-                    if path < self.__dist[neighbor]:
-                        self.__dist[neighbor] = path
-                        self.__pred[neighbor] = pos
-                        if neighbor not in self.__visited:  
-                            for i in range(len(self.__priority_queue.queue)):
-                                if self.__priority_queue.queue[i][1] == neighbor:
-                                    self.__priority_queue.queue.pop(i)
-                            self.__priority_queue.put((self.__dist[neighbor], neighbor))
-                        else:
-                            self.__priority_queue.get((self.__dist[neighbor], neighbor))
-                            self.__visited.add(neighbor)
-                        string = f"{self.graph.node_view(pos).label}{path}"
-                        if self.__inside:
-                            string += f'{pos}'
-                            self.graph.node_view(neighbor).label_on(string, COLORS[FIREBRICK])
-                        else:
-                            self.graph.node_view(neighbor).label_on_side(string, COLORS[FIREBRICK])
-            self.__locked.add(self.__selected)
-            if self.__priority_queue.qsize() == 0 or self.end in self.__locked:
-                self.__solved = True
-            return self.show_shortest_path()
+        self.seek(len(self.__steps) + 1)
+        return self.show_shortest_path()
               
-    def solve(self):
-        # Dijkstra :main
-        while not self.solved:
-            self.dijkstra_step()
-                        
-        if self.solved:
-            self.dijkstra_path()
-            self.color_dijkstra_path()
+    def solve(self, headless=None):
+        # Dijkstra :main, the view (if any) is updated once with the final state
+        headless = self.__headless if headless is None else headless
+        self.run()
+        if headless:
+            return self.__shortest_path
+        self.seek(len(self.__steps))
+        self.color_dijkstra_path()
         return self.view()
     # ------------------------Dijkstra---------------------#  
     
     def next(self):
-        if self.solved:
+        if self.__cursor is not None and self.__cursor >= len(self.__steps) and self.solved:
             print('Dijkstra résolu')
             self.dijkstra_path()
             self.color_dijkstra_path()
             return self.view()
-        elif self.__first_step:
-            self.__first_step = False
-            self.graph.color_on(self.__selected, SELECTED_NODE_COLOR)
-            return self.view()
-        else:
-            for s in self.__temp:
-                self.graph.color_on(s, -1)
-            self.__temp = set()
-            for s in self.__visited:
-                self.graph.color_on(s, -1)
-            for s in self.__locked:
-                self.graph.color_on(s, LOCKED_NODE_COLOR)
-            pos_weight, pos = self.__priority_queue.get()
-            self.__selected = pos
-            self.__visited.add(pos)
-            self.graph.color_on(pos, SELECTED_NODE_COLOR)
-            for neighbor in self.graph.neighbors(pos):
-                if neighbor not in self.__locked:
-                    self.graph.color_on(neighbor, NEIGHBOR_COLOR)   
-                    self.__temp.add(neighbor)          
-                    path = pos_weight + self.cost_between(pos, neighbor)
-                    string = f"{self.graph.node_view(pos).label}{path}"
-                    if path < self.__dist[neighbor]:
-                        self.__dist[neighbor] = path
-                        self.__pred[neighbor] = pos
-                        if neighbor not in self.__visited:  
-                            for i in range(len(self.__priority_queue.queue)):
-                                if self.__priority_queue.queue[i][1] == neighbor:
-                                    self.__priority_queue.queue.pop(i)
-                            self.__priority_queue.put((self.__dist[neighbor], neighbor))
-                        else:
-                            self.__priority_queue.get((self.__dist[neighbor], neighbor))
-                            self.__visited.add(neighbor)
-                        if self.__inside:
-                            string += f'{LETTERS[neighbor]}'
-                            self.graph.node_view(neighbor).label_on(string, COLORS[FIREBRICK])
-                        else:
-                            self.graph.node_view(neighbor).label_on_side(string, COLORS[FIREBRICK])
-            self.__locked.add(self.__selected)
-            if self.__priority_queue.qsize() == 0 or self.end in self.__locked:
-                self.__solved = True
-                
-            return self.view()
+        self.__cursor = 0 if self.__cursor is None else self.__cursor + 1
+        return self.seek(self.__cursor)
@@ -0,0 +1,79 @@
+"""
+frontier.py
+
+File de priorité utilisée par les algorithmes de plus court chemin de path_finder.
+Il s'agit d'un tas binaire (heapq) avec suppression paresseuse : diminuer la clé d'un nœud
+revient à empiler une nouvelle entrée, les anciennes entrées devenues obsolètes sont
+ignorées au moment où elles sortent du tas.
+"""
+
+import heapq
+
+
+class Frontier:
+    """
+    class Frontier modélise la frontière d'un parcours de type Dijkstra : l'ensemble des
+    nœuds atteints mais pas encore verrouillés, ordonnés par distance provisoire.
+
+    Chaque opération push / pop coûte O(log n) ; une entrée obsolète n'est dépilée
+    qu'une seule fois, d'où une résolution complète en O((n + m) log n).
+
+    Note:
+    -----
+        À priorité égale les nœuds sortent dans l'ordre de leur identifiant, comme avec
+        l'ancienne queue.PriorityQueue de tuples (distance, node_id).
+    """
+
+    def __init__(self):
+        self.__heap = []  # Entrées (priorité, node_id), éventuellement obsolètes
+        self.__best = {}  # node_id: priorité de l'entrée valide
+
+    def __len__(self):
+        # Nombre de nœuds réellement présents (entrées obsolètes exclues)
+        return len(self.__best)
+
+    def __bool__(self):
+        return bool(self.__best)
+
+    def __contains__(self, node_id):
+        return node_id in self.__best
+
+    def priority(self, node_id):
+        return self.__best[node_id]
+
+    def push(self, priority, node_id):
+        """
+        Ajoute node_id ou diminue sa priorité ; une priorité supérieure ou égale
+        à la priorité courante est ignorée. Retourne True si la frontière a changé.
+        """
+        best = self.__best.get(node_id)
+        if best is not None and best <= priority:
+            return False
+        self.__best[node_id] = priority
+        heapq.heappush(self.__heap, (priority, node_id))
+        return True
+
+    def _drop_stale(self):
+        heap = self.__heap
+        while heap and self.__best.get(heap[0][1]) != heap[0][0]:
+            heapq.heappop(heap)
+
+    def peek(self):
+        """Retourne le couple (priorité, node_id) minimal sans le retirer"""
+        self._drop_stale()
+        if not self.__heap:
+            raise IndexError('peek from an empty frontier')
+        return self.__heap[0]
+
+    def pop(self):
+        """Retire et retourne le couple (priorité, node_id) minimal"""
+        self._drop_stale()
+        if not self.__heap:
+            raise IndexError('pop from an empty frontier')
+        priority, node_id = heapq.heappop(self.__heap)
+        del self.__best[node_id]
+        return priority, node_id
+
+    def discard(self, node_id):
+        # L'entrée restée dans le tas devient obsolète
+        self.__best.pop(node_id, None)
@@ -0,0 +1,154 @@
+"""
+replay.py
+
+Rejeu, sur la vue d'un Graph, du journal d'événements produit par une résolution
+de Dijkstra sans visualisation (mode headless).
+
+Le journal est une liste plate d'événements :
+    (SELECT, node_id, distance)        le nœud sort de la frontière
+    (RELAX, node_id, pred_id, distance) la distance de node_id est améliorée via pred_id
+    (LOCK, node_id)                    le nœud est verrouillé
+complétée par la liste des indices de début de chaque étape.
+"""
+
+from constantes import *
+
+SELECT = 'select'
+RELAX = 'relax'
+LOCK = 'lock'
+
+
+class DijkstraReplay:
+    """
+    class DijkstraReplay calcule l'état visuel (couleurs, étiquettes) de n'importe quelle
+    étape d'une résolution et ne l'applique à la vue du graphe que sur demande.
+
+    Parameters:
+    -----------
+        graph : Graph
+            le graphe dont on met à jour la vue
+        start : int
+            le nœud de départ
+        events : list
+            le journal d'événements (partagé avec le solveur, il peut encore grandir)
+        steps : list
+            les indices dans events du début de chaque étape
+        inside : bool
+            étiquettes de distance dans les nœuds (True) ou à côté (False)
+
+    Note:
+    -----
+        L'étape 0 est l'état initial (seul le départ est sélectionné), l'étape k est
+        l'état après k sélections. Avancer d'une étape coûte O(événements de l'étape) ;
+        revenir en arrière recalcule depuis l'étape 0.
+    """
+
+    def __init__(self, graph, start, events, steps, inside=True):
+        self.__graph = graph
+        self.__start = start
+        self.__events = events
+        self.__steps = steps
+        self.__inside = inside
+        self.__shown = None # Étape actuellement affichée par la vue
+        self.rewind()
+
+    @property
+    def step(self):
+        return self.__step
+
+    def steps_count(self):
+        return len(self.__steps)
+
+    # +++++MODEL+++++ #
+
+    def rewind(self):
+        self.__step = 0
+        self.__colors = {self.__start: SELECTED_NODE_COLOR} # node_id: color_id (blanc si absent)
+        self.__labels = {} # node_id: étiquette de distance
+        self.__locked = set()
+        self.__selected = None
+        self.__neighbors = set()
+
+    def step_events(self, step):
+        # Events of the step-th selection (step >= 1)
+        begin = self.__steps[step - 1]
+        end = self.__steps[step] if step < len(self.__steps) else len(self.__events)
+        return self.__events[begin:end]
+
+    def label(self, node_id, pred_id, distance):
+        string = f"{self.__graph.node_view(pred_id).label}{distance}"
+        if self.__inside:
+            string += self.__graph.node_view(node_id).label
+        return string
+
+    def advance(self):
+        # Move the cached frame one step forward, return the set of node_ids whose look changed
+        changed = set(self.__neighbors)
+        for node_id in self.__neighbors:
+            self.__colors.pop(node_id, None)
+        if self.__selected is not None:
+            self.__locked.add(self.__selected)
+            self.__colors[self.__selected] = LOCKED_NODE_COLOR
+            changed.add(self.__selected)
+        self.__step += 1
+        for event in self.step_events(self.__step):
+            if event[0] == SELECT:
+                self.__selected = event[1]
+                self.__colors[self.__selected] = SELECTED_NODE_COLOR
+                changed.add(self.__selected)
+            elif event[0] == RELAX:
+                _, node_id, pred_id, distance = event
+                self.__labels[node_id] = self.label(node_id, pred_id, distance)
+                changed.add(node_id)
+        self.__neighbors = {v for v in self.__graph.neighbors(self.__selected) if v not in self.__locked and v != self.__selected}
+        for node_id in self.__neighbors:
+            self.__colors[node_id] = NEIGHBOR_COLOR
+        changed |= self.__neighbors
+        return changed
+
+    def frame(self, step):
+        """
+        Retourne l'état de l'étape step : (couleurs, étiquettes), deux dictionnaires
+        node_id: color_id et node_id: étiquette ; les nœuds absents sont blancs et
+        gardent leur étiquette d'origine. Les dictionnaires retournés ne doivent pas être modifiés.
+        """
+        step = min(step, len(self.__steps))
+        if step < self.__step:
+            self.rewind()
+        while self.__step < step:
+            self.advance()
+        return self.__colors, self.__labels
+
+    # +++++VIEW+++++ #
+
+    def invalidate(self):
+        # The view was modified elsewhere : next show repaints every node
+        self.__shown = None
+
+    def apply(self, node_id):
+        graph = self.__graph
+        graph.color_on(node_id, self.__colors.get(node_id, WHITE))
+        if node_id in self.__labels:
+            if self.__inside:
+                graph.node_view(node_id).label_on(self.__labels[node_id], COLORS[FIREBRICK])
+            else:
+                graph.node_view(node_id).label_on_side(self.__labels[node_id], COLORS[FIREBRICK])
+        else:
+            graph.node_view(node_id).label_on()
+            graph.node_view(node_id).label_off_side()
+
+    def show(self, step):
+        """
+        Applique l'étape step à la vue et retourne les node_id repeints : seuls les nœuds
+        modifiés si step suit l'étape affichée, tous sinon
+        """
+        step = min(step, len(self.__steps))
+        if self.__shown is not None and step == self.__shown + 1 and self.__step == self.__shown:
+            changed = self.advance()
+        else:
+            self.frame(step)
+            changed = self.__graph.node_ids()
+        for node_id in changed:
+            self.apply(node_id)
+        self.__shown = step
+        return changed
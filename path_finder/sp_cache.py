@@ -0,0 +1,118 @@
+"""
+sp_cache.py
+
+Cache des arbres de plus courts chemins d'un graphe.
+
+Pour une source, l'arbre (distances, prédécesseurs) est calculé une fois par Dijkstra ;
+les questions suivantes depuis cette source (distance, chemin vers n'importe quel nœud)
+sont des lectures de dictionnaires et une remontée des prédécesseurs.
+Les arbres sont gardés pour au plus maxsize sources (LRU) et oubliés dès que les sommets,
+les arêtes ou les poids du graphe changent (Graph.model_version).
+"""
+
+from collections import OrderedDict
+from math import inf
+from weakref import WeakKeyDictionary, ref
+
+from path_finder.frontier import Frontier
+
+
+def shortest_path_tree(graph, source):
+    """
+    Retourne (dist, pred) : distances depuis source et prédécesseurs des nœuds atteignables.
+    Un poids absent (None) compte pour 1, comme pour networkx.
+    """
+    dist = {source: 0}
+    pred = {}
+    locked = set()
+    frontier = Frontier()
+    frontier.push(0, source)
+    while frontier:
+        distance, node_id = frontier.pop()
+        locked.add(node_id)
+        for neighbor, weight in graph.weighted_neighbors(node_id):
+            if neighbor in locked:
+                continue
+            path = distance + (1 if weight is None else weight)
+            if path < dist.get(neighbor, inf):
+                dist[neighbor] = path
+                pred[neighbor] = node_id
+                frontier.push(path, neighbor)
+    return dist, pred
+
+
+class ShortestPathCache:
+    """
+    class ShortestPathCache
+
+    Parameters:
+    -----------
+        graph : Graph
+            le graphe interrogé, gardé par une référence faible : le cache ne le maintient
+            pas en vie (voir CACHES)
+        maxsize : int
+            nombre maximal d'arbres gardés
+    """
+
+    def __init__(self, graph, maxsize=64):
+        self.__graph = ref(graph)
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self.__trees = OrderedDict() # source: (dist, pred), du moins au plus récemment utilisé
+        self.__version = graph.model_version
+
+    def __len__(self):
+        return len(self.__trees)
+
+    @property
+    def graph(self):
+        # None once the graph is collected
+        return self.__graph()
+
+    def invalidate(self):
+        self.__trees.clear()
+        self.__version = self.graph.model_version
+
+    def tree(self, source):
+        # (dist, pred) from source, computed only if absent or if the graph changed
+        graph = self.graph
+        if self.__version != graph.model_version:
+            self.invalidate()
+        tree = self.__trees.get(source)
+        if tree is not None:
+            self.hits += 1
+            self.__trees.move_to_end(source)
+            return tree
+        self.misses += 1
+        tree = shortest_path_tree(graph, source)
+        self.__trees[source] = tree
+        while len(self.__trees) > self.maxsize:
+            self.__trees.popitem(last=False)
+        return tree
+
+    def distance(self, source, target):
+        # inf if target is not reachable
+        return self.tree(source)[0].get(target, inf)
+
+    def path(self, source, target):
+        # [source, ..., target], [] if target is not reachable
+        dist, pred = self.tree(source)
+        if target not in dist:
+            return []
+        path = [target]
+        while path[-1] != source:
+            path.append(pred[path[-1]])
+        path.reverse()
+        return path
+
+
+CACHES = WeakKeyDictionary() # graph: ShortestPathCache
+
+
+def cache_for(graph, maxsize=64):
+    """Retourne le cache des arbres de plus courts chemins de graph (créé au premier appel)"""
+    cache = CACHES.get(graph)
+    if cache is None:
+        cache = CACHES[graph] = ShortestPathCache(graph, maxsize)
+    return cache
@@ -16,22 +16,42 @@ TODO
     - traiter des graphes valués
 """
 
-import imp
-import graphviz as gv
-import networkx as nx
 import random
 import json
 import io
+import heapq
+from contextlib import contextmanager
+from functools import wraps
 from constantes import *
+from lazy import lazy_import
+from view_store import NodeStore, EdgeStore, ordered
+from collections import deque
+from array import array
+from cow import Shared, share, own, release, track
 
+# networkx and graphviz (through dot_view) are loaded on first use, numpy (through csr)
+# only by the csr backend
+nx = lazy_import('networkx')
+dot_view = lazy_import('dot_view')
+csr = lazy_import('csr')
+shared_graph = lazy_import('shared_graph')
 
+BACKENDS = ('networkx', 'csr')
 
-# ----------
-# CONSTANTES
+# Kinds of changes in the journal of a graph : (version, kind, elements)
+NODE_ADDED = 'node_added'         # elements : node ids
+NODE_REMOVED = 'node_removed'     # node ids, their incident edges are removed too
+EDGE_ADDED = 'edge_added'         # (s1, s2, weight), an edge already present gets the new weight
+EDGE_REMOVED = 'edge_removed'     # (s1, s2)
+WEIGHT_CHANGED = 'weight_changed' # (s1, s2, weight)
+VIEW_CHANGED = 'view_changed'     # node ids or (s1, s2) ; () for the whole view
+MODEL_REPLACED = 'model_replaced' # () : the model was set as a whole (Graph.model = ...)
+MODEL_CHANGES = {NODE_ADDED, NODE_REMOVED, EDGE_ADDED, EDGE_REMOVED, WEIGHT_CHANGED, MODEL_REPLACED}
 
-# -- about shape and label
-#
-from constantes import *
+# Default attributes of the views : a node or an edge only stores what differs from them
+NODE_ATTR = {'fixedsize':'true', 'width':NODE_WIDTH, 'height':NODE_HEIGHT, 'margin':NODE_MARGIN,
+             'shape':CIRCLE, 'style':'filled', 'fillcolor':COLORS[WHITE], 'fontsize':FONTSIZE}
+EDGE_ATTR = {'style':'filled', 'color':COLORS[BLACK]}
 
 
 # -----------
@@ -40,27 +60,22 @@ from constantes import *
 class NodeView:
     """
     La classe NodeView modélise les propriétés d'un noeud pour sa visualisation. 
-    Cet objet est stocké comme information supplémentaire du modèle networkx
+    C'est un mandataire léger, construit à la demande par Graph.node_view : les propriétés
+    sont rangées dans le NodeStore du graphe (voir view_store.py)
     
     Parameters
     ----------
-        gv : graphviz.Graph | graphviz.Digraph
-            la vue à laquelle cette vue noeud est rattachée
+        graph : Graph
+            le graphe auquel ce noeud appartient
         node_id : int
             numéro identifiant le sommet
-        color_id : int
-            un numéro de couleur (valeur par défaut -1)
     """
 
-    def __init__(self, gv, node_id, color_id=WHITE, fontsize=FONTSIZE):        
-        self.__gv = gv
-        self.__id = node_id 
-        self.__color_id = color_id
-        self.__pos = None
-        self.__label = str(node_id)
-        self.__ech = 1
-        self.__width = NODE_WIDTH
-        self.__fontsize = fontsize
+    __slots__ = ('__graph', '__id')
+
+    def __init__(self, graph, node_id):
+        self.__graph = graph
+        self.__id = node_id
     
     # Public attributes
     
@@ -70,87 +85,106 @@ class NodeView:
         
     @property
     def color_id(self):
-        return self.__color_id
+        return self.__graph.node_store.color_id(self.__id)
     
     @color_id.setter
     def color_id(self, color_id):
-        self.__color_id = min(max(-len(COLORS), color_id), len(COLORS)-1)
+        color_id = min(max(-len(COLORS), color_id), len(COLORS)-1)
+        if color_id != self.color_id:
+            self._store().set_color_id(self.__id, color_id)
     
     @property
     def pos(self):
-        return self.__pos
+        return self.__graph.node_store.pos(self.__id)
     
     @pos.setter
     def pos(self, pos):
-        self.__pos = pos
+        if (None if pos is None else list(pos)) != self.pos:
+            self._store().set_pos(self.__id, pos)
         
     @property
     def width(self):
-        return self.__width
+        return self.__graph.node_store.width(self.__id)
     
     @width.setter
     def width(self, width):
-        self.__width = width
+        if float(width) != self.width:
+            self._store().set_width(self.__id, float(width))
 
     @property
     def ech(self):
-        return self.__ech
+        return self.__graph.node_store.ech(self.__id)
     
     @ech.setter
     def ech(self, ech):
-        self.__ech = ech
+        if ech != self.ech:
+            self._store().set_ech(self.__id, ech)
 
     @property
     def label(self):
-        return self.__label
+        return self.__graph.node_store.label(self.__id)
     
     @label.setter
     def label(self, label):
         if not isinstance(label, str):
             label = str(self.id)
-        self.__label = label
+        if label != self.label:
+            self._store().set_label(self.__id, label)
     
     @property
     def gv(self):
-        return self.__gv
+        return self.__graph.view
    
     @property
     def fontsize(self):
-        return self.__fontsize
+        return FONTSIZE
 
     
     # View modification methods
+
+    def _store(self):
+        # Writable node store, the graph records the change
+        self.__graph._changed(VIEW_CHANGED, (self.__id,))
+        return self.__graph.own_node_store()
+
+    def _set(self, *args, **attrs):
+        if self.gv.node_differs(str(self.id), *args, **attrs):
+            self.__graph._changed(VIEW_CHANGED, (self.__id,))
+            self.gv.node(str(self.id), *args, **attrs)
     
     def create(self):
-        self.__gv.node(str(self.id), self.label, shape=CIRCLE, style='filled', fillcolor=self.color(), width=NODE_WIDTH, height=NODE_HEIGHT, fontsize=self.fontsize)
+        # Default properties : shape, color, size and font are the node_attr of the view ;
+        # part of adding the node, not a change of its own
+        self.__graph.own_node_store().reset(self.__id)
     
     
     # -- about labels
     
     def label_on(self, label = None, color=COLORS[BLACK]):
-        if label == None:
-            self.__gv.node(str(self.id), self.label, fontcolor=color, fontsize=FONTSIZE)
+        if label == None or (label == self.label and len(label) <= 2):
+            # The label of the node store, written in the DOT source (NodeStore.dot_attributes)
+            self._set(_attributes={'label': None}, fontcolor=color, fontsize=FONTSIZE)
         else:
             if len(label) <= 2:
-                self.__gv.node(str(self.id), label, fontcolor=color, fontsize=FONTSIZE)
+                self._set(label, fontcolor=color, fontsize=FONTSIZE)
             elif len(label) > 2 and len(label) <= 5:
-                self.__gv.node(str(self.id), label, fontcolor=color, fontsize=REDUCE_FONTSIZE)
+                self._set(label, fontcolor=color, fontsize=REDUCE_FONTSIZE)
             else:
-                self.__gv.node(str(self.id), xlabel=label, fontcolor=color, fontsize=FONTSIZE)
+                self._set(xlabel=label, fontcolor=color, fontsize=FONTSIZE)
                 
                 
 
     def label_off(self):
-        self.__gv.node(str(self.id), NOLABEL)
+        self._set(NOLABEL)
         
     def label_on_side(self, label=None, color=COLORS[BLACK]):
         if label == None:
-            self.__gv.node(str(self.id), xlabel=self.label, fontcolor=color)
+            self._set(xlabel=self.label, fontcolor=color)
         else:
-            self.__gv.node(str(self.id), xlabel=label, fontcolor=color)
+            self._set(xlabel=label, fontcolor=color)
 
     def label_off_side(self):
-        self.__gv.node(str(self.id), xlabel=NOLABEL)
+        self._set(xlabel=NOLABEL)
         
     
     # -- about colors
@@ -168,10 +202,10 @@ class NodeView:
                 color_str = COLORS[WHITE]
         else:
             color_str = self.color()
-        self.__gv.node(str(self.id), style='filled', fillcolor=color_str)
+        self._set(style='filled', fillcolor=color_str)
 
     def color_off(self):
-        self.__gv.node(str(self.id), style='filled', fillcolor=COLORS[WHITE])
+        self._set(style='filled', fillcolor=COLORS[WHITE])
         
         
     # -- about position and size
@@ -184,50 +218,43 @@ class NodeView:
             self.pos = self.pos[0] + dx, self.pos[1] + dy
 
     def place(self, ech=None):
+        # The DOT position is pos * ech, read in the node store (NodeStore.dot_attributes)
         if self._is_positioned():
-            ech = self.ech if ech is None else ech
-            self.ech = ech
-            x, y = self.pos
-            pos = f'{x*ech},{y*ech}!'
-            self.__gv.node(str(self.id), pos=pos)
+            self.ech = self.ech if ech is None else ech
             
         
     def size(self, *dim):
         if len(dim) == 0:
             w, h = NODE_WIDTH, NODE_HEIGHT
-            self.width = NODE_WIDTH
         elif len(dim) == 1:
             w, h = dim[0], dim[0]
-            self.width = dim[0]
         else:
             w, h = dim
-            width = dim[0]
-        self.__gv.node(str(self.id), width=str(w), height=str(h))
+        # width (and height = width) are read in the node store, only another height is a view attribute
+        self.width = w
+        self._set(height=None if float(h) == float(w) else str(h))
 
 
     
 class EdgeView:
     """
     La classe EdgeView modélise les propriétés d'une arête ou d'un arc pour sa visualisation. 
-    Cet objet est stocké comme information supplémentaire du modèle networkx
+    C'est un mandataire léger, construit à la demande par Graph.edge_view : la couleur est
+    rangée dans l'EdgeStore du graphe, le poids lu dans le modèle
     
     Parameters
     ----------
-        gv : graphviz.Graph | graphviz.Digraph
-            la vue à laquelle cette vue noeud est rattachée
-        edge : 
+        graph : Graph
+            le graphe auquel cette arête appartient
+        node_src, node_dst : int
             couple de node_id identifiant l'arc/arête
-        color_id : int
-            un numéro de couleur (valeur par défaut -1)
-        weight : 
-            La dimension l'attribut shape circle qui est égale à la hauteur
     """
 
-    def __init__(self, gv, node_src, node_dst, weight=None, color_id=BLACK):        
-        self.__gv = gv
+    __slots__ = ('__graph', '__edge')
+
+    def __init__(self, graph, node_src, node_dst):
+        self.__graph = graph
         self.__edge = (node_src, node_dst)
-        self.__color_id = color_id
-        self.__weight = weight
         
     # Public attributes
     
@@ -237,34 +264,39 @@ class EdgeView:
         
     @property
     def color_id(self):
-        return self.__color_id
+        return self.__graph.edge_store.color_id(*self.__edge)
     
     @color_id.setter
     def color_id(self, color_id):
-        self.__color_id = min(max(-len(COLORS), color_id), len(COLORS)-1)
+        self._store().set_color_id(*self.__edge, min(max(-len(COLORS), color_id), len(COLORS)-1))
 
     @property
     def weight(self):
-        return self.__weight
-    
-    @weight.setter
-    def weight(self, weight):
-        if not isinstance(weight, str):
-            weight = str(self.weight)
-        self.__weight = weight
+        return self.__graph.edge_informations(*self.__edge).get('weight')
     
     @property
     def gv(self):
-        return self.__gv
+        return self.__graph.view
    
     
     # View modification methods
+
+    def _store(self):
+        # Writable edge store, the graph records the change
+        self.__graph._changed(VIEW_CHANGED, (self.__edge,))
+        return self.__graph.own_edge_store()
+
+    def _set(self, **attrs):
+        if self.gv.edge_differs(str(self.edge[0]), str(self.edge[1]), **attrs):
+            self.__graph._changed(VIEW_CHANGED, (self.__edge,))
+            self.gv.edge(str(self.edge[0]), str(self.edge[1]), **attrs)
     
     def create(self):
-        if not self.weight:
-            self.__gv.edge(str(self.edge[0]), str(self.edge[1]), style='filled', color=self.color())
-        else:
-            self.__gv.edge(str(self.edge[0]), str(self.edge[1]), str(self.weight), style='filled', color=self.color())
+        # Default properties : the edge_attr of the view, the weight label comes from the model ;
+        # part of adding the edge, not a change of its own
+        if self.__graph.edge_store.color_id(*self.__edge) != BLACK:
+            self.__graph.own_edge_store().discard(*self.__edge)
+        self.gv.remove_edge(str(self.edge[0]), str(self.edge[1]))
         
     
     # -- about colors
@@ -282,16 +314,69 @@ class EdgeView:
                 color_str = COLORS[BLACK]
         else:
             color_str = self.color()
-        self.gv.edge(str(self.edge[0]), str(self.edge[1]), str(self.weight), style='filled', color=color_str)
+        self._set(style='filled', color=color_str)
 
     def color_off(self):
-        self.__gv.edge(str(self.edge[0]), str(self.edge[1]), style='filled', color=COLORS[BLACK])
+        self._set(style='filled', color=COLORS[BLACK])
         
-            
+
+def grouped(method):
+    # Bulk method of Graph : all its view changes make one journal entry
+    @wraps(method)
+    def grouped_method(self, *args, **kwargs):
+        with self._grouped():
+            return method(self, *args, **kwargs)
+    return grouped_method
+
+
+class IdAllocator:
+    """
+    class IdAllocator attribue les numéros des nouveaux sommets en O(1).
+    
+    Parameters:
+    -----------
+        next_id : int
+            le prochain numéro libre (tous les numéros suivants le sont aussi)
+        reuse : bool
+            si True les numéros des sommets supprimés sont réattribués, les plus petits d'abord
+    """
+
+    def __init__(self, next_id=0, reuse=False):
+        self.next_id = next_id
+        self.reuse = reuse
+        self.__free = [] # tas des numéros libérés
+
+    def allocate(self, count=1):
+        # The new ids : released ones first if reused, then a block of consecutive ids
+        reused = [heapq.heappop(self.__free) for _ in range(min(count, len(self.__free)))]
+        first = self.next_id
+        self.next_id += count - len(reused)
+        return reused, range(first, self.next_id)
+
+    def release(self, node_id):
+        if self.reuse and isinstance(node_id, int):
+            heapq.heappush(self.__free, node_id)
+
+    def copy(self):
+        ids = IdAllocator(self.next_id, self.reuse)
+        ids.__free = list(self.__free)
+        return ids
+
+    def reserve(self, node_id):
+        # node_id is now used (added directly in the model) ; ids that are not ints are never allocated
+        if not isinstance(node_id, int):
+            return
+        if node_id >= self.next_id:
+            self.next_id = node_id + 1
+        elif self.__free and node_id in self.__free:
+            self.__free.remove(node_id)
+            heapq.heapify(self.__free)
+
+    
 class Graph:
     """
     class Graph modélise un graphe non orienté dont le propriétés importantes sont :
-    - model : un objet graphe au sens de networkx
+    - model : un objet graphe au sens de networkx (ou un csr.CSRModel, voir backend)
     - view : un objet graphe au sens de graphviz
         
     Parameters:
@@ -303,6 +388,9 @@ class Graph:
             nx.erdos_renyi_graph(nodes_count, 0.5)
         engine : str
             le moteur de rendu (au sens de graphviz) ; par défaut 'neato'
+        backend : str
+            'networkx' (par défaut) ou 'csr' : topologie compacte dans des tableaux NumPy
+            (voir csr.py), pour les graphes de plusieurs millions d'arêtes
     
     Note:
     -----
@@ -310,49 +398,169 @@ class Graph:
         des graphes orientés et des graphes bi-partie
     """
         
-    def __init__(self, nodes_count=0, random=False, directed=False, bipartite=False, n1=0, n2=0, engine='neato', strict=False):
+    def __init__(self, nodes_count=0, random=False, directed=False, bipartite=False, n1=0, n2=0, engine='neato', strict=False, backend='networkx'):
+        if backend not in BACKENDS:
+            raise ValueError(f"backend must be one of {BACKENDS}, not {backend!r}")
         if random:
-            self.__model = nx.erdos_renyi_graph(nodes_count, 0.5)
-        elif directed:
-            self.__model = nx.DiGraph()
+            model = nx.erdos_renyi_graph(nodes_count, 0.5)
         elif bipartite:
-            self.__model = nx.complete_bipartite_graph(n1, n2)
+            model = nx.complete_bipartite_graph(n1, n2)
+        elif backend == 'csr':
+            model = csr.CSRModel(directed=directed)
+        elif directed:
+            model = nx.DiGraph()
         else:
-            self.__model = nx.Graph()
+            model = nx.Graph()
+        if backend == 'csr' and not isinstance(model, csr.CSRModel):
+            model = csr.CSRModel.from_networkx(model)
+        model.add_nodes_from(range(nodes_count))
+        # Copy-on-write boxes, given back when the graph is collected (see copy)
+        self.__boxes = track(self, {'model': Shared(model), 'node_store': Shared(NodeStore()),
+                                    'edge_store': Shared(EdgeStore(directed))})
+        self.__backend = backend
         if directed:
-            self.__view = gv.Digraph(engine=engine, strict=strict, edge_attr={'arrowsize':ARROWSIZE}, node_attr={'fixedsize':'true', 'width':NODE_WIDTH, 'height':NODE_HEIGHT, 'margin':NODE_MARGIN})
+            self.view = dot_view.DotDigraph(engine=engine, strict=strict, edge_attr={**EDGE_ATTR, 'arrowsize':ARROWSIZE}, node_attr=dict(NODE_ATTR))
         else:
-            self.__view = gv.Graph(engine=engine, strict=strict, node_attr={'fixedsize':'true', 'width':NODE_WIDTH, 'height':NODE_HEIGHT, 'margin':NODE_MARGIN})
+            self.view = dot_view.DotGraph(engine=engine, strict=strict, edge_attr=dict(EDGE_ATTR), node_attr=dict(NODE_ATTR))
         self.__engine = engine
-        self.__model.add_nodes_from([node_id, {'view': None}] for node_id in range(nodes_count))
+        self.__batch_depth = 0
+        self.__placement_pending = False
+        self.__ids = IdAllocator(max(model.nodes, default=-1) + 1)
+        self.__version = 0
+        self.__model_version = 0
+        self.__journal = None
+        self.__group = None
         self.init_view()
         
     
     @property
     def model(self):
-        return self.__model
+        return self.__boxes['model'].value
     
     @model.setter
     def model(self, model):
-        self.__model = model
+        # A new model, not shared with the copies : every cached result on the old one is stale
+        release(self.__boxes['model'])
+        self.__boxes['model'] = Shared(model)
+        # New ids after the largest node of the new model, default properties for its nodes
+        self.__ids = IdAllocator(max((node_id for node_id in model.nodes if isinstance(node_id, int)), default=-1) + 1,
+                                 self.__ids.reuse)
+        self.init_nodes_view()
+        self._changed(MODEL_REPLACED)
     
     @property
     def view(self):
+        if self.__view is None:
+            # Unpickled graph : the view is rebuilt on first use
+            self.__restore_view()
         return self.__view
     
     @view.setter
     def view(self, view):
+        # The view lists the nodes and edges of the model, it only stores their own attributes
         self.__view = view
+        view.members = self
+
+    @property
+    def ids(self):
+        return self.__ids
+
+    @property
+    def node_store(self):
+        return self.__boxes['node_store'].value
+
+    @property
+    def edge_store(self):
+        return self.__boxes['edge_store'].value
+
+    # -- about copy-on-write : model, node store and edge store may be shared with copies
+
+    def _own_model(self):
+        # Writable model, copied first if it is shared
+        box = self.__boxes['model'] = own(self.__boxes['model'])
+        return box.value
+
+    def own_node_store(self):
+        box = self.__boxes['node_store'] = own(self.__boxes['node_store'])
+        return box.value
+
+    def own_edge_store(self):
+        box = self.__boxes['edge_store'] = own(self.__boxes['edge_store'])
+        return box.value
 
     @property
     def engine(self):
         return self.__engine
+
+    @property
+    def backend(self):
+        return self.__backend
     
     @engine.setter
     def engine(self, engine):
         self.__engine = engine
     
     # MODEL METHODS
+
+    # -- about changes
+    # every mutator of the graph increments version ; direct changes of model or view are not seen
+
+    @property
+    def version(self):
+        return self.__version
+
+    @property
+    def model_version(self):
+        # Version of the last change of nodes, edges or weights
+        return self.__model_version
+
+    @property
+    def journal(self):
+        return self.__journal
+
+    def journal_on(self, maxlen=1024):
+        # Record the changes (version, kind, elements), only the maxlen last ones are kept
+        self.__journal = deque(self.__journal or (), maxlen)
+
+    def journal_off(self):
+        self.__journal = None
+
+    def changes_since(self, version):
+        """
+        Retourne la liste des changements (version, nature, éléments) postérieurs à version,
+        ou None si le journal est désactivé ou ne remonte pas jusque-là : tout a pu changer.
+        """
+        if version >= self.__version:
+            return []
+        if not self.__journal or self.__journal[0][0] > version + 1:
+            return None
+        return [entry for entry in self.__journal if entry[0] > version]
+
+    @contextmanager
+    def _grouped(self):
+        # The view changes made inside are recorded once, at the end, with all their elements
+        if self.__group is not None:
+            yield
+            return
+        self.__group = []
+        try:
+            yield
+        finally:
+            group, self.__group = self.__group, None
+            if group:
+                # () : the whole view
+                elements = () if () in group else tuple(element for elements in group for element in elements)
+                self._changed(VIEW_CHANGED, elements)
+
+    def _changed(self, kind, elements=()):
+        if kind == VIEW_CHANGED and self.__group is not None:
+            self.__group.append(tuple(elements))
+            return
+        self.__version += 1
+        if kind in MODEL_CHANGES:
+            self.__model_version = self.__version
+        if self.__journal is not None:
+            self.__journal.append((self.__version, kind, elements))
     
     # -- about information
     
@@ -374,38 +582,127 @@ class Graph:
     # -- about adding elements
     
     def add_nodes(self, nodes_count=1):
-        first = 0 if self.number_of_nodes() == 0 else max(self.node_ids()) + 1
-        for new_id in range(first, first+nodes_count):
-            self.model.add_nodes_from([(new_id, {'g':self, 'view': NodeView(self.view, new_id)})])
-            self.node_view(new_id).create()
+        # Ids from the allocator, nodes and their views added in one operation
+        reused, new_ids = self.ids.allocate(nodes_count)
+        for node_id in reused:
+            self._own_model().add_node(node_id)
+            self.own_node_store().reset(node_id)
+        if reused:
+            self._changed(NODE_ADDED, tuple(reused))
+        self._own_model().add_nodes_from(new_ids)
+        if new_ids:
+            self.own_node_store().reset(new_ids.start, len(new_ids))
+            self._changed(NODE_ADDED, new_ids)
+
+    def _add_endpoint(self, node_id):
+        # A node added through an edge
+        if node_id not in self.model.nodes:
+            self.ids.reserve(node_id)
+            self._own_model().add_node(node_id)
+            self.own_node_store().reset(node_id)
+            self._changed(NODE_ADDED, (node_id,))
 
     def add_edge(self, s1, s2, weight=None):
-        self.model.add_edge(s1, s2, weight=weight, view=EdgeView(self.view, s1, s2, weight))
+        self._add_endpoint(s1)
+        self._add_endpoint(s2)
+        if not self.model.has_edge(s1, s2):
+            self._changed(EDGE_ADDED, ((s1, s2, weight),))
+        elif self.edge_informations(s1, s2).get('weight') != weight:
+            self._changed(WEIGHT_CHANGED, ((s1, s2, weight),))
+        self._own_model().add_edge(s1, s2, weight=weight)
         self.edge_view(s1, s2).create()
     
+    @staticmethod
+    def edge_columns(edges):
+        # (origins, destinations, weights) lists from tuples (s1, s2[, weight]),
+        # an (m, 2) / (m, 3) NumPy array or a pair (triple) of 1-D arrays
+        if getattr(edges, 'ndim', None) == 2:
+            columns = [edges[:, 0], edges[:, 1]] + ([edges[:, 2]] if edges.shape[1] > 2 else [])
+        elif isinstance(edges, tuple) and len(edges) in (2, 3) and all(getattr(c, 'ndim', None) == 1 for c in edges):
+            columns = list(edges)
+        else:
+            src, dst, weights = [], [], []
+            for s1, s2, *args in edges:
+                src.append(s1)
+                dst.append(s2)
+                weights.append(args[0] if args else None)
+            return src, dst, weights
+        src, dst = (column.astype('int64').tolist() for column in columns[:2])
+        weights = columns[2].tolist() if len(columns) > 2 else [None] * len(src)
+        return src, dst, weights
+
     def add_edges_from(self, iterable=None):
-        for s in iterable:
-            s1, s2, *args = s
-            self.add_edge(s1, s2, *args)
+        """
+        Ajoute des arêtes en un seul passage dans le modèle : iterable de tuples (s1, s2[, poids]),
+        tableau NumPy (m, 2) ou (m, 3), ou couple (triplet) de tableaux (origines, destinations[, poids]).
+        Les nouvelles arêtes ont les propriétés visuelles par défaut : rien n'est écrit dans la vue.
+        """
+        src, dst, weights = self.edge_columns(iterable)
+        if not len(src):
+            return
+        for node_id in set(src).union(dst):
+            self._add_endpoint(node_id)
+        if self.backend == 'csr':
+            self._own_model().add_edge_arrays(src, dst, weights)
+        else:
+            self._own_model().add_edges_from(zip(src, dst, ({'weight': weight} for weight in weights)))
+        self._changed(EDGE_ADDED, tuple(zip(src, dst, weights)) if self.journal is not None else ())
+        if self.edge_store.color_ids or self.view.edge_states:
+            # Edges added again get back their default properties
+            for s1, s2 in zip(src, dst):
+                self.edge_view(s1, s2).create()
     
     # -- about removing elements
+    # only the view elements of the removed nodes / edges are dropped : colors, labels
+    # and positions of the others are kept
+
+    def incident_edges(self, node_id):
+        return list(self.model.edges(node_id))
+
+    def _remove_node_view(self, node_id):
+        # O(degree) : the node and its incident edges
+        for s1, s2 in self.incident_edges(node_id):
+            self.own_edge_store().discard(s1, s2)
+            self.view.remove_edge(str(s1), str(s2))
+        self.view.remove_node(str(node_id))
+        if node_id in self.node_store.sparse:
+            # Sparse ids are not reused : their row goes with the node
+            del self.own_node_store().sparse[node_id]
 
     def remove_node(self, node_id):
         if node_id in self.node_ids():
-            self.model.remove_node(node_id)
-            self.reset_view()
+            self._remove_node_view(node_id)
+            self._own_model().remove_node(node_id)
+            self.ids.release(node_id)
+            self._changed(NODE_REMOVED, (node_id,))
     
     def remove_nodes_from(self, iterable):
-        self.model.remove_nodes_from(iterable)
-        self.reset_view()
+        node_ids = [node_id for node_id in iterable if node_id in self.node_ids()]
+        for node_id in node_ids:
+            self._remove_node_view(node_id)
+        self._own_model().remove_nodes_from(node_ids)
+        for node_id in node_ids:
+            self.ids.release(node_id)
+        if node_ids:
+            self._changed(NODE_REMOVED, tuple(node_ids))
 
     def remove_edge(self, s1, s2):
-        self.model.remove_edge(s1, s2)
-        self.reset_view()
+        self._own_model().remove_edge(s1, s2)
+        self.own_edge_store().discard(s1, s2)
+        self.view.remove_edge(str(s1), str(s2))
+        self._changed(EDGE_REMOVED, ((s1, s2),))
     
     def remove_edges_from(self, iterable):
-        self.model.remove_edges_from(iterable)
-        self.reset_view()
+        edges = [tuple(edge) for edge in iterable]
+        removed = []
+        for s1, s2, *_ in edges:
+            if self.model.has_edge(s1, s2):
+                self.own_edge_store().discard(s1, s2)
+                self.view.remove_edge(str(s1), str(s2))
+                removed.append((s1, s2))
+        self._own_model().remove_edges_from(edges)
+        if removed:
+            self._changed(EDGE_REMOVED, tuple(removed))
     
     def remove_random_edges(self, edges_count):
         edges_count = min(edges_count, self.number_of_edges())
@@ -415,13 +712,109 @@ class Graph:
         
     # -- copy of graph
     
+    def subgraph_view(self, node_ids):
+        """Vue sans copie du graphe restreint aux sommets node_ids (voir SubgraphView)"""
+        return SubgraphView(self, node_ids)
+
     def copy(self):
-        nodes_count = self.number_of_nodes()
-        g = Graph(nodes_count, engine=self.engine)
-        g.add_edges_from(self.edges())    
-        g.same_position_as(self)
+        """
+        Copie en O(1) : le modèle, les propriétés visuelles et l'état de la vue sont partagés
+        en copy-on-write avec la copie ; chaque partie n'est copiée qu'à la première
+        modification de l'un des deux graphes, par celui qui la modifie.
+        Dans un batch, la copie ne voit pas les appels graphviz encore en attente.
+        """
+        g = object.__new__(type(self))
+        g.__dict__.update(self.__dict__)
+        # A collected copy gives its boxes back (cow.track) : the graph owns them alone again
+        g.__boxes = track(g, {name: share(box) for name, box in self.__boxes.items()})
+        g.__ids = self.__ids.copy()
+        g.__journal = None if self.__journal is None else deque(self.__journal, self.__journal.maxlen)
+        g.__batch_depth = 0
+        g.__group = None
+        g.view = self.view.copy()
         return g
 
+    # -- about pickling : only the topology, the weights and the compact view attributes
+
+    def __getstate__(self):
+        """
+        État transmis par pickle (multiprocessing) : le modèle (pour le backend csr, les
+        identifiants des nœuds et les tableaux des arêtes), les propriétés visuelles compactes
+        et les attributs propres de la vue, puis les autres attributs de l'instance (ceux d'une
+        sous-classe comme BiPartite). Ni la vue graphviz ni le journal ne sont transmis ; dans
+        un batch, les appels graphviz encore en attente ne le sont pas non plus.
+        """
+        if self.backend == 'csr':
+            model = (self.model.is_directed(), array('q', self.model.iter_nodes()), self.model.edge_arrays(),
+                     self.model.has_int_weights())
+        else:
+            # Only the topology and the weight attributes are held by the networkx model
+            model = self.model
+        if self.__view is None:
+            view = self.__view_state
+        else:
+            view = (self.__view.directed, self.__view._copy_kwargs(), self.__view.node_states, self.__view.edge_states)
+        return {
+            'backend': self.backend,
+            'model': model,
+            'node_store': self.node_store,
+            'edge_store': self.edge_store,
+            'ids': self.ids,
+            'engine': self.engine,
+            'version': self.version,
+            'model_version': self.model_version,
+            'view': view,
+            # Attributes of subclasses and instances ; those of Graph are the entries above
+            'attributes': {name: value for name, value in self.__dict__.items() if not name.startswith('_Graph__')},
+        }
+
+    def __setstate__(self, state):
+        self.__dict__.update(state.get('attributes', {}))
+        model = state['model']
+        if state['backend'] == 'csr':
+            directed, nodes, (src, dst, weights), integers = model
+            size = max(nodes, default=-1) + 1
+            model = csr.CSRModel(size, directed)
+            model.remove_nodes_from(set(range(size)).difference(nodes))
+            model.add_edge_arrays(src, dst, weights, integers)
+        self.__boxes = track(self, {'model': Shared(model), 'node_store': Shared(state['node_store']),
+                                    'edge_store': Shared(state['edge_store'])})
+        self.__backend = state['backend']
+        self.__view = None
+        self.__view_state = state['view']
+        self.__engine = state['engine']
+        self.__batch_depth = 0
+        self.__placement_pending = False
+        self.__ids = state['ids']
+        self.__version = state['version']
+        self.__model_version = state['model_version']
+        self.__journal = None
+        self.__group = None
+        self.view_is_up_to_date = True
+
+    def __restore_view(self):
+        # (directed, graphviz arguments, node states, edge states) -> the view
+        directed, kwargs, node_states, edge_states = self.__view_state
+        view = dot_view.DotDigraph(**kwargs) if directed else dot_view.DotGraph(**kwargs)
+        view.node_box.value.update(node_states)
+        view.edge_box.value.update(edge_states)
+        self.__view_state = None
+        self.view = view
+
+    # -- about shared memory
+
+    def to_shared(self):
+        """
+        Publie la topologie et les poids (tableaux CSR) en mémoire partagée et retourne le
+        shared_graph.SharedGraph en lecture seule correspondant ; les autres processus s'y
+        rattachent sans copie (shared_graph.attach(handle), ou par pickle du SharedGraph).
+        Le graphe publié ne suit pas les modifications ultérieures de self.
+
+        >>> with g.to_shared() as shared:
+        ...     distances, paths = shortest_paths_batch(shared, pairs, workers=8)
+        """
+        return shared_graph.SharedGraph.publish(self)
+
     # -- load a complete json file graph description
     def load_json(self, filename, encoding='utf-8'):
         with open(filename, 'r', encoding=encoding) as jsonfile:
@@ -464,53 +857,133 @@ class Graph:
     
     def neighbors(self, node_id):
         return self.model.neighbors(node_id)
+
+    def weighted_neighbors(self, node_id):
+        # [(neighbor, weight)] : the successors for a directed graph
+        if self.backend == 'csr':
+            return self.model.weighted_neighbors(node_id)
+        return [(v_id, information.get('weight')) for v_id, information in self.model.adj[node_id].items()]
+
+    def weighted_predecessors(self, node_id):
+        # [(predecessor, weight)] : the same as weighted_neighbors for an undirected graph
+        if self.backend == 'csr':
+            return self.model.weighted_predecessors(node_id)
+        if not self.model.is_directed():
+            return self.weighted_neighbors(node_id)
+        return [(u_id, information.get('weight')) for u_id, information in self.model.pred[node_id].items()]
     
     
     # VIEW METHODS
     
+    # -- about batch updates
+
+    def in_batch(self):
+        return self.__batch_depth > 0
+
+    @contextmanager
+    def batch(self):
+        """
+        Regroupe des modifications : dans le bloc seuls le modèle networkx et l'état en attente
+        de la vue changent (les appels graphviz sont mis en file, les placements des nœuds
+        sont faits une seule fois) ; la vue est réconciliée à la sortie du bloc le plus externe.
+
+        >>> with g.batch():
+        ...     g.add_nodes(1000)
+        ...     g.add_edges_from(edges)
+        ...     g.position(positions, 0.5)
+        """
+        if self.__batch_depth == 0:
+            self.view.hold()
+            self.view_is_up_to_date = False
+        self.__batch_depth += 1
+        try:
+            yield self
+        finally:
+            self.__batch_depth -= 1
+            if self.__batch_depth == 0:
+                self.update_view()
+
+    @grouped
+    def update_view(self):
+        # Reconcile the view : pending placements, then every queued graphviz call
+        if self.__placement_pending:
+            self.__placement_pending = False
+            for node_id in self.node_ids():
+                self.node_view(node_id).place()
+        self.view.release()
+        self.view_is_up_to_date = True
+
     def node_view(self, node_id):
-        return self.model.nodes[node_id]['view']
+        if node_id not in self.model.nodes:
+            raise KeyError(node_id)
+        return NodeView(self, node_id)
     
     def edge_view(self, node_src, node_dst):
-        return self.model.edges[node_src, node_dst]['view']
+        if not self.model.has_edge(node_src, node_dst):
+            raise KeyError((node_src, node_dst))
+        return EdgeView(self, node_src, node_dst)
+
+    def dot_nodes(self):
+        # (name, attributes) of the nodes for the DOT source : position, size and label of the node store
+        store = self.node_store
+        for node_id in self.node_ids():
+            yield str(node_id), store.dot_attributes(node_id)
+
+    def dot_edges(self):
+        # (tail name, head name, attributes) of the edges for the DOT source : the weight label
+        for s1, s2, weight in self.model.edges(data='weight'):
+            yield str(s1), str(s2), ({'label': str(weight)} if weight else None)
     
     def init_view(self):
+        if self.in_batch():
+            self.view.hold()
         self.init_nodes_view()
         self.init_edges_view()
-        self.view_is_up_to_date = True
+        self._changed(VIEW_CHANGED)
+        self.view_is_up_to_date = not self.in_batch()
         
     def reset_view(self, engine=None, strict=False):
         engine = self.engine if engine is None else engine
         d_position = self.export_position()
-        self.__view = gv.Graph(engine=engine, format='svg', strict=strict, node_attr={'fixedsize':'true', 'width':NODE_WIDTH, 'height':NODE_HEIGHT, 'margin':NODE_MARGIN})
+        self.view = dot_view.DotGraph(engine=engine, format='svg', strict=strict, edge_attr=dict(EDGE_ATTR), node_attr=dict(NODE_ATTR))
         self.init_view()
         self.import_position(d_position)
         
     def init_nodes_view(self):
-        for node_id in self.node_ids():
-            self.model.nodes[node_id]['view'] = NodeView(self.view, node_id)
-            self.node_view(node_id).create()
+        # Default properties for every node, in one pass over the arrays
+        self.own_node_store().clear()
+        if self.number_of_nodes():
+            self.own_node_store().reset_nodes(self.node_ids())
 
     def init_edges_view(self):
-        for s1, s2 in self.edges():
-            information = self.edge_informations(s1, s2)
-            weight = information.get('weight', None)
-            if s2 > s1:
-                self.model.edges[s1, s2]['weight'] = weight
-                self.model.edges[s1, s2]['view'] = EdgeView(self.view, s1, s2, weight)
-                self.edge_view(s1, s2).create()
+        # Edges have default properties : only the weight attribute of the model is completed
+        self.own_edge_store().clear()
+        if self.backend == 'networkx' and any('weight' not in information for *_, information in self.model.edges(data=True)):
+            for s1, s2, information in self._own_model().edges(data=True):
+                information.setdefault('weight', None)
             
     # -- about nodes positionning and resizing
     
+    @grouped
     def position(self, iterable, ech=1):
         for node_id, *pos in iterable:
             self.node_view(node_id).pos = pos
         self.scale(ech)
         
+    @grouped
     def scale(self, ech=None):
+        if self.in_batch():
+            # Only the scale is recorded, nodes are placed once when the batch ends
+            if ech is not None:
+                for node_id in self.node_ids():
+                    if self.node_view(node_id)._is_positioned():
+                        self.node_view(node_id).ech = ech
+            self.__placement_pending = True
+            return
         for node_id in self.node_ids():
             self.node_view(node_id).place(ech)
         
+    @grouped
     def same_position_as(self, g):
         for node_id in g.node_ids():
             if node_id in self.node_ids():
@@ -529,6 +1002,7 @@ class Graph:
                     node_ids.add(v_id)
                     self._rec_move(node_ids, seen, dx, dy)
                     
+    @grouped
     def move(self, node_id, dx, dy, group=False):
         if group:
             self._rec_move({node_id}, set(), dx, dy)
@@ -536,6 +1010,7 @@ class Graph:
             self.node_view(node_id).move(dx, dy)
         self.scale()
     
+    @grouped
     def resize(self, *dim, node_id=None):
         if node_id is None:
             for node_id in self.node_ids():
@@ -587,6 +1062,7 @@ class Graph:
         ech = self.node_view(lnodes[0]).ech if lnodes else 1
         return nodes, edges, positions, labels, ech
 
+    @grouped
     def import_position(self, d_position):
         ech = d_position['ech']
         for node_id in self.node_ids():
@@ -596,6 +1072,7 @@ class Graph:
 
     # -- about labels
     
+    @grouped
     def set_labels(self, labels=None):
         """
         Change all nodes label with the str labels parameter
@@ -610,16 +1087,19 @@ class Graph:
             for node_id in self.node_ids():
                 self.node_view(node_id).label = labels[node_id]
     
+    @grouped
     def label_on(self):
         for node_id in self.node_ids():
             self.node_view(node_id).label_on()
 
+    @grouped
     def label_off(self):
         for node_id in self.node_ids():
             self.node_view(node_id).label_off()
     
     # -- about colors
 
+    @grouped
     def color_on(self, *args):
         if len(args) == 2:
             node_id, color = args
@@ -628,10 +1108,12 @@ class Graph:
             for node_id in self.node_ids():
                 self.node_view(node_id).color_on()
 
+    @grouped
     def color_off(self):
         for node_id in self.node_ids():
             self.node_view(node_id).color_off()
             
+    @grouped
     def color_on_edge(self, *args):
         if len(args) == 3:
             node_src, node_dst, color = args
@@ -640,6 +1122,7 @@ class Graph:
             for node_src, node_dst in self.edges():
                 self.edge_view(node_src, node_dst).color_on()
 
+    @grouped
     def color_off_edge(self):
         for node_src, node_dst in self.edges():
             self.edge_view(node_src, node_dst).color_off()
@@ -648,6 +1131,8 @@ class Graph:
     
     def is_weighted(self):
         # Return true if the graph is ponderate
+        if self.backend == 'csr':
+            return self.model.is_weighted()
         return nx.is_weighted(self.model)
     
     def get_node_attributes(self, node_id):
@@ -674,6 +1159,8 @@ class DiGraph(Graph):
             le nombre de sommets du graphe (par défaut 0)
         engine : str
             le moteur de rendu
+        backend : str
+            'networkx' (par défaut) ou 'csr'
     
     Note:
     -----
@@ -681,33 +1168,18 @@ class DiGraph(Graph):
     """
 
     
-    def __init__(self, nodes_count=0, engine='neato', strict=False):
-        Graph.__init__(self, nodes_count, random=False, directed=True, strict=strict, engine=engine)
+    def __init__(self, nodes_count=0, engine='neato', strict=False, backend='networkx'):
+        Graph.__init__(self, nodes_count, random=False, directed=True, strict=strict, engine=engine, backend=backend)
         
     def reset_view(self, engine=None, strict=False):
         engine = self.engine if engine is None else engine
         d_position = self.export_position()
-        self.view = gv.Digraph(engine=engine, strict=strict, edge_attr={'arrowsize':ARROWSIZE}, node_attr={'fixedsize':'true', 'width':NODE_WIDTH, 'height':NODE_HEIGHT, 'margin':NODE_MARGIN})
+        self.view = dot_view.DotDigraph(engine=engine, strict=strict, edge_attr={**EDGE_ATTR, 'arrowsize':ARROWSIZE}, node_attr=dict(NODE_ATTR))
         self.init_view()
         self.import_position(d_position)
 
-    def init_edges_view(self):
-        for s1, s2 in self.edges():
-            informations = self.edge_informations(s1, s2)
-            weight = informations.get('weight', None)
-            self.model.edges[s1, s2]['weight'] = weight
-            self.model.edges[s1, s2]['view'] = EdgeView(self.view, s1, s2, weight)
-            self.edge_view(s1, s2).create()
-
-    def copy(self):
-        nodes_count = self.number_of_nodes()
-        g = DiGraph(nodes_count, engine=self.engine)
-        for s1, s2 in self.edges():
-            informations = self.edge_informations(s1, s2)
-            weight = informations.get('weight', None)
-            g.add_edge(s1, s2, weight)    
-        g.same_position_as(self)
-        return g
+    def incident_edges(self, node_id):
+        return list(self.model.in_edges(node_id)) + list(self.model.out_edges(node_id))
 
     def degree(self, node_id):
         return len(self.neighbors(node_id))
@@ -744,13 +1216,82 @@ class BiPartite(Graph):
         Graph.__init__(self, n1+n2, bipartite=True, n1=n1, n2=n2, engine=engine)
         self.n1 = n1
         self.n2 = n2
-        
-    def copy(self):
-        nodes_count = self.number_of_nodes()
-        g = Graph(nodes_count, bipartite=True, n1=self.n1, n2=self.n2, engine=self.engine)
-        g.init_view()
-        g.add_edges_from(self.edges())
-        g.same_position_as(self)
-        return g
 
 
+class SubgraphView:
+    """
+    class SubgraphView est une vue d'une partie des sommets d'un graphe : le modèle et l'état
+    de la vue du graphe sont filtrés, pas copiés. Les modifications du graphe (couleurs,
+    étiquettes, positions...) y sont visibles. La construire coûte O(len(node_ids)) et son
+    source DOT O(somme des degrés des sommets gardés).
+    
+    Parameters:
+    -----------
+        graph : Graph
+            le graphe filtré
+        node_ids : iterable
+            les sommets gardés, dans cet ordre
+    """
+
+    def __init__(self, graph, node_ids):
+        self.__graph = graph
+        self.__nodes = dict.fromkeys(node_ids) # ensemble ordonné
+        self.__view = graph.view.filtered(self)
+
+    @property
+    def graph(self):
+        return self.__graph
+
+    @property
+    def view(self):
+        return self.__view
+
+    # -- about information
+
+    def node_ids(self):
+        nodes = self.__graph.model.nodes
+        return [node_id for node_id in self.__nodes if node_id in nodes]
+
+    def edges(self):
+        return [(s1, s2) for s1, s2, _ in self.weighted_edges()]
+
+    def weighted_edges(self):
+        # (s1, s2, weight) for the edges between two kept nodes, each edge once
+        directed = self.__graph.model.is_directed()
+        for s1 in self.node_ids():
+            for s2, information in self.__graph.model.adj[s1].items():
+                if s2 in self.__nodes and (directed or ordered(s1, s2) == (s1, s2)):
+                    yield s1, s2, information.get('weight')
+
+    def edge_informations(self, s1, s2):
+        return self.__graph.edge_informations(s1, s2)
+
+    def number_of_nodes(self):
+        return len(self.node_ids())
+
+    def number_of_edges(self):
+        return len(self.edges())
+
+    def neighbors(self, node_id):
+        return [v_id for v_id in self.__graph.neighbors(node_id) if v_id in self.__nodes]
+
+    def node_view(self, node_id):
+        if node_id not in self.__nodes:
+            raise KeyError(node_id)
+        return self.__graph.node_view(node_id)
+
+    # -- about the DOT source of the view
+
+    def dot_nodes(self):
+        store = self.__graph.node_store
+        for node_id in self.node_ids():
+            yield str(node_id), store.dot_attributes(node_id)
+
+    def dot_edges(self):
+        for s1, s2, weight in self.weighted_edges():
+            yield str(s1), str(s2), ({'label': str(weight)} if weight else None)
+
+    # -- write view in file
+
+    def write(self, filename='output', format='svg', view = True):
+        self.view.render(filename, format=format, view=view)
@@ -0,0 +1,195 @@
+"""
+render_cache.py
+
+Cache des rendus graphviz adressé par contenu.
+
+La clé d'un rendu est l'empreinte SHA-256 de (source DOT, moteur, format) : re-rendre un
+graphe inchangé, ou une image identique d'une animation pas à pas, ne lance pas de
+processus graphviz mais coûte une recherche dans un dictionnaire.
+
+Deux niveaux :
+    - en mémoire, LRU borné en nombre d'entrées ;
+    - sur disque (optionnel), un fichier par rendu, borné en taille totale ; les fichiers
+      les moins récemment utilisés sont supprimés au-delà.
+
+RENDER_CACHE est l'instance partagée par Graph.write, l'affichage SVG dans Jupyter et
+Dijkstra.diaporama.
+"""
+
+import hashlib
+import os
+from collections import OrderedDict
+
+from lazy import lazy_import
+
+gv = lazy_import('graphviz')
+
+
+class RenderCache:
+    """
+    class RenderCache
+
+    Parameters:
+    -----------
+        maxsize : int
+            nombre maximal de rendus gardés en mémoire
+        directory : str | None
+            dossier du niveau disque ; None pour le désactiver
+        max_disk_bytes : int
+            taille totale maximale des fichiers du niveau disque
+    """
+
+    def __init__(self, maxsize=256, directory=None, max_disk_bytes=256 * 2**20):
+        self.maxsize = maxsize
+        self.max_disk_bytes = max_disk_bytes
+        self.hits = 0
+        self.misses = 0
+        self.__memory = OrderedDict() # key: bytes, du plus ancien au plus récent
+        self.__directory = None
+        self.__disk_bytes = 0
+        self.use_directory(directory)
+
+    @property
+    def directory(self):
+        return self.__directory
+
+    def use_directory(self, directory, max_disk_bytes=None):
+        # Enable (or disable with None) the disk tier
+        if max_disk_bytes is not None:
+            self.max_disk_bytes = max_disk_bytes
+        self.__directory = directory
+        self.__disk_bytes = 0
+        if directory is not None:
+            os.makedirs(directory, exist_ok=True)
+            self.__disk_bytes = sum(entry.stat().st_size for entry in os.scandir(directory) if entry.is_file())
+            self._evict_disk()
+
+    def __len__(self):
+        return len(self.__memory)
+
+    @staticmethod
+    def key(source, engine, format):
+        digest = hashlib.sha256()
+        digest.update(f'{engine}\0{format}\0'.encode())
+        digest.update(source.encode('utf-8'))
+        return digest.hexdigest()
+
+    # -- memory tier
+
+    def _remember(self, key, data):
+        self.__memory[key] = data
+        self.__memory.move_to_end(key)
+        while len(self.__memory) > self.maxsize:
+            self.__memory.popitem(last=False)
+
+    # -- disk tier
+
+    def _disk_path(self, key):
+        return os.path.join(self.__directory, key)
+
+    def _disk_get(self, key):
+        if self.__directory is None:
+            return None
+        path = self._disk_path(key)
+        try:
+            with open(path, 'rb') as file:
+                data = file.read()
+        except FileNotFoundError:
+            return None
+        os.utime(path) # Most recently used
+        return data
+
+    def _disk_put(self, key, data):
+        if self.__directory is None or len(data) > self.max_disk_bytes:
+            return
+        path = self._disk_path(key)
+        if os.path.exists(path):
+            return
+        tmp = f'{path}.{os.getpid()}.tmp'
+        with open(tmp, 'wb') as file:
+            file.write(data)
+        os.replace(tmp, path)
+        self.__disk_bytes += len(data)
+        self._evict_disk()
+
+    def _evict_disk(self):
+        if self.__disk_bytes <= self.max_disk_bytes:
+            return
+        entries = sorted((entry for entry in os.scandir(self.__directory) if entry.is_file()),
+                         key=lambda entry: entry.stat().st_mtime)
+        self.__disk_bytes = sum(entry.stat().st_size for entry in entries)
+        for entry in entries:
+            if self.__disk_bytes <= self.max_disk_bytes:
+                break
+            self.__disk_bytes -= entry.stat().st_size
+            os.remove(entry.path)
+
+    # -- public API
+
+    def get(self, key):
+        data = self.__memory.get(key)
+        if data is not None:
+            self.__memory.move_to_end(key)
+            return data
+        data = self._disk_get(key)
+        if data is not None:
+            self._remember(key, data)
+        return data
+
+    def put(self, key, data):
+        self._remember(key, data)
+        self._disk_put(key, data)
+
+    def render(self, source, engine='dot', format='svg'):
+        """Retourne le rendu (bytes) de la source DOT, graphviz n'est lancé qu'en cas d'absence"""
+        key = self.key(source, engine, format)
+        data = self.get(key)
+        if data is not None:
+            self.hits += 1
+            return data
+        self.misses += 1
+        data = gv.pipe(engine, format, source.encode('utf-8'))
+        self.put(key, data)
+        return data
+
+    def render_many(self, sources, engine='dot', format='svg', workers=None):
+        """
+        Retourne les rendus (bytes) d'une liste de sources DOT, dans le même ordre.
+        Les sources identiques ne sont rendues qu'une fois ; celles absentes du cache sont
+        rendues simultanément par au plus workers processus graphviz (os.cpu_count() par défaut).
+        """
+        keys = [self.key(source, engine, format) for source in sources]
+        results = {}
+        missing = {}
+        for key, source in zip(keys, sources):
+            if key in results or key in missing:
+                continue
+            data = self.get(key)
+            if data is None:
+                missing[key] = source
+            else:
+                results[key] = data
+        self.hits += len(keys) - len(missing)
+        self.misses += len(missing)
+        if missing:
+            # Each render is its own graphviz process : threads only wait for them
+            from concurrent.futures import ThreadPoolExecutor
+            workers = min(workers or os.cpu_count() or 1, len(missing))
+            with ThreadPoolExecutor(max_workers=workers) as pool:
+                rendered = pool.map(lambda source: gv.pipe(engine, format, source.encode('utf-8')), missing.values())
+                for key, data in zip(missing, rendered):
+                    self.put(key, data)
+                    results[key] = data
+        return [results[key] for key in keys]
+
+    def clear(self):
+        self.__memory.clear()
+        self.hits = self.misses = 0
+        if self.__directory is not None:
+            for entry in os.scandir(self.__directory):
+                if entry.is_file():
+                    os.remove(entry.path)
+            self.__disk_bytes = 0
+
+
+RENDER_CACHE = RenderCache()
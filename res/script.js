@@ -1,4 +1,5 @@
 const diapo = document.querySelector('.diapo')
+const deltaSteps = document.querySelector('#delta-steps')
 let timer, elements, slides, slideWidth
 elements = document.querySelector('.elements')
 slides = Array.from(elements.children)
@@ -6,8 +7,16 @@ let next = document.querySelector('#nav-droite')
 let prev = document.querySelector('#nav-gauche')
 let compteur = 0
 slideWidth = diapo.getBoundingClientRect().width
-next.addEventListener('click', slideNext)
-prev.addEventListener('click', slidePrev)
+if(deltaSteps){
+    deltaSetup()
+}else{
+    next.addEventListener('click', slideNext)
+    prev.addEventListener('click', slidePrev)
+    window.addEventListener("resize", () => {
+        slideWidth = diapo.getBoundingClientRect().width
+        slideNext()
+    })
+}
 function slideNext(){
 compteur++
 if(compteur == slides.length){
@@ -24,7 +33,86 @@ function slidePrev(){
     let decal = -slideWidth * compteur
     elements.style.transform = `translateX(${decal}px)`
 }
-window.addEventListener("resize", () => {
-    slideWidth = diapo.getBoundingClientRect().width
-    slideNext()
-})
+// Delta animation : a single svg, each step only lists the nodes it changes
+// {node name: {fillcolor, fontcolor, label, xlabel}}
+function deltaSetup(){
+    const steps = JSON.parse(deltaSteps.textContent)
+    const title = document.querySelector('.slide h1')
+    const nodes = {}
+    const base = {}
+    document.querySelectorAll('.slide svg g.node').forEach(g => {
+        const name = g.querySelector('title').textContent
+        const shape = g.querySelector('ellipse, polygon, path')
+        const text = g.querySelector('text')
+        nodes[name] = g
+        base[name] = {fillcolor: shape ? shape.getAttribute('fill') : null,
+                      fontcolor: text ? text.getAttribute('fill') : null,
+                      label: text ? text.textContent : '',
+                      xlabel: ''}
+    })
+    function xlabel(g){
+        let text = g.querySelector('text.xlabel')
+        if(!text){
+            const box = g.querySelector('ellipse, polygon, path').getBBox()
+            text = document.createElementNS('http://www.w3.org/2000/svg', 'text')
+            text.setAttribute('class', 'xlabel')
+            text.setAttribute('x', box.x + box.width)
+            text.setAttribute('y', box.y)
+            text.setAttribute('font-size', '10')
+            g.appendChild(text)
+        }
+        return text
+    }
+    function applyNode(name, attrs){
+        const g = nodes[name]
+        if(!g){
+            return
+        }
+        const shape = g.querySelector('ellipse, polygon, path')
+        const text = g.querySelector('text:not(.xlabel)')
+        if('fillcolor' in attrs && shape){
+            shape.setAttribute('fill', attrs.fillcolor)
+        }
+        if('label' in attrs && text){
+            text.textContent = attrs.label
+        }
+        if('xlabel' in attrs){
+            xlabel(g).textContent = attrs.xlabel
+        }
+        if('fontcolor' in attrs){
+            for(const t of [text, g.querySelector('text.xlabel')]){
+                if(t && attrs.fontcolor){
+                    t.setAttribute('fill', attrs.fontcolor)
+                }else if(t){
+                    t.removeAttribute('fill')
+                }
+            }
+        }
+    }
+    let shown = 0
+    function show(step){
+        // Forward by one : only the changes of that step, otherwise replay from the base
+        let first = shown
+        if(step != shown + 1){
+            first = 0
+            for(const name in base){
+                applyNode(name, base[name])
+            }
+        }
+        shown = step
+        for(let k = first; k < step; k++){
+            for(const name in steps[k]){
+                applyNode(name, steps[k][name])
+            }
+        }
+        title.textContent = 'Step : ' + step
+    }
+    next.addEventListener('click', () => {
+        compteur = (compteur + 1) % (steps.length + 1)
+        show(compteur)
+    })
+    prev.addEventListener('click', () => {
+        compteur = (compteur + steps.length) % (steps.length + 1)
+        show(compteur)
+    })
+}
@@ -0,0 +1,198 @@
+"""
+shared_graph.py
+
+Publication de la topologie d'un graphe en mémoire partagée (multiprocessing.shared_memory).
+
+Graph.to_shared() range les tableaux CSR du modèle (liste d'arêtes, offsets, voisins,
+poids et, pour un graphe orienté, leurs équivalents pour les prédécesseurs) dans des blocs
+de mémoire partagée. Un autre processus s'y rattache avec attach(handle), ou reçoit
+directement le SharedGraph par pickle : il obtient un graphe en lecture seule dont les
+tableaux NumPy sont lus dans les blocs, sans copie.
+
+Le SharedGraph expose la partie de l'API de Graph utilisée par path_finder (node_ids,
+weighted_neighbors, weighted_predecessors, model_version...) : sp_cache, bidirectional
+et batch s'en servent tels quels. Le processus qui publie libère les blocs par unlink()
+(ou à la sortie d'un bloc with) ; chaque processus rattaché appelle close().
+"""
+
+from multiprocessing import resource_tracker
+from multiprocessing.shared_memory import SharedMemory
+
+from lazy import lazy_import
+
+np = lazy_import('numpy')
+csr = lazy_import('csr')
+
+# Published arrays : CSRModel.edge_arrays(), csr() and, for a directed graph, reverse_csr()
+EDGE_ARRAYS = ('src', 'dst', 'weight')
+CSR_ARRAYS = ('offsets', 'neighbors', 'weights')
+REVERSE_ARRAYS = ('reverse_offsets', 'reverse_neighbors', 'reverse_weights')
+
+
+def open_block(name):
+    # Attach to an existing block without registering it : the resource tracker would
+    # unlink it when this process exits, only its creator must
+    try:
+        return SharedMemory(name, track=False) # Python >= 3.13
+    except TypeError:
+        pass
+    register = resource_tracker.register
+    resource_tracker.register = lambda name, rtype: None
+    try:
+        return SharedMemory(name)
+    finally:
+        resource_tracker.register = register
+
+
+class SharedGraph:
+    """
+    class SharedGraph est un graphe en lecture seule sur des tableaux en mémoire partagée.
+
+    Parameters:
+    -----------
+        handle : dict
+            description des blocs (noms, types, longueurs) et du graphe, petite et
+            sérialisable : c'est elle qui est transmise aux autres processus
+        blocks : dict
+            nom du tableau: SharedMemory
+
+    Note:
+    -----
+        Ne pas construire directement : utiliser Graph.to_shared() ou attach(handle).
+        Le graphe reflète le modèle au moment de la publication ; model_version est celle
+        du graphe publié.
+    """
+
+    backend = 'csr'
+
+    def __init__(self, handle, blocks, owner=False):
+        self.__handle = handle
+        self.__blocks = blocks
+        self.__owner = owner
+        arrays = {}
+        for name, (block_name, dtype, length) in handle['arrays'].items():
+            array = np.ndarray((length,), dtype=dtype, buffer=blocks[name].buf)
+            array.flags.writeable = False
+            arrays[name] = array
+        edges = tuple(arrays[name] for name in EDGE_ARRAYS)
+        rows = tuple(arrays[name] for name in CSR_ARRAYS)
+        reverse = tuple(arrays[name] for name in REVERSE_ARRAYS) if handle['directed'] else None
+        self.__model = csr.CSRModel.from_compiled(handle['absent'], handle['directed'], edges, rows, reverse,
+                                                  handle['int_weights'])
+
+    @classmethod
+    def publish(cls, graph):
+        """Copie les tableaux CSR du modèle de graph dans de nouveaux blocs partagés"""
+        model = graph.model if graph.backend == 'csr' else csr.CSRModel.from_networkx(graph.model)
+        columns = dict(zip(EDGE_ARRAYS, model.edge_arrays()))
+        columns.update(zip(CSR_ARRAYS, model.csr()))
+        if model.is_directed():
+            columns.update(zip(REVERSE_ARRAYS, model.reverse_csr()))
+        size = len(columns['offsets']) - 1
+        handle = {
+            'directed': model.is_directed(),
+            'absent': tuple(sorted(set(range(size)).difference(model.iter_nodes()))),
+            'model_version': graph.model_version,
+            'int_weights': model.has_int_weights(),
+            'arrays': {},
+        }
+        blocks = {}
+        try:
+            for name, column in columns.items():
+                block = blocks[name] = SharedMemory(create=True, size=max(column.nbytes, 1))
+                np.ndarray(column.shape, dtype=column.dtype, buffer=block.buf)[:] = column
+                handle['arrays'][name] = (block.name, column.dtype.str, len(column))
+        except BaseException:
+            for block in blocks.values():
+                block.close()
+                block.unlink()
+            raise
+        return cls(handle, blocks, owner=True)
+
+    def __reduce__(self):
+        # Pickled as its handle : the receiving process attaches to the same blocks
+        return attach, (self.__handle,)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        if self.__owner:
+            self.unlink()
+        else:
+            self.close()
+
+    @property
+    def handle(self):
+        return self.__handle
+
+    @property
+    def model(self):
+        return self.__model
+
+    @property
+    def model_version(self):
+        return self.__handle['model_version']
+
+    def nbytes(self):
+        return sum(block.size for block in self.__blocks.values())
+
+    # -- about the blocks
+
+    def close(self):
+        # This process no longer reads the blocks ; the arrays must not be used afterwards
+        self.__model = None
+        for block in self.__blocks.values():
+            block.close()
+
+    def unlink(self):
+        # Publisher only : close and free the blocks for every process
+        self.close()
+        if self.__owner:
+            for block in self.__blocks.values():
+                block.unlink()
+
+    # -- about the topology, read only
+
+    def node_ids(self):
+        return self.__model.nodes
+
+    def number_of_nodes(self):
+        return self.__model.number_of_nodes()
+
+    def edges(self):
+        return self.__model.edges
+
+    def number_of_edges(self):
+        return self.__model.number_of_edges()
+
+    def edge_informations(self, s1, s2):
+        return self.__model.edge_data(s1, s2)
+
+    def is_weighted(self):
+        return self.__model.is_weighted()
+
+    def neighbors(self, node_id):
+        return self.__model.neighbors(node_id)
+
+    def weighted_neighbors(self, node_id):
+        return self.__model.weighted_neighbors(node_id)
+
+    def weighted_predecessors(self, node_id):
+        return self.__model.weighted_predecessors(node_id)
+
+    def degree(self, node_id):
+        return self.__model.degree(node_id)
+
+
+def attach(handle):
+    """Retourne le SharedGraph en lecture seule publié sous handle (SharedGraph.handle)"""
+    blocks = {}
+    try:
+        for name, (block_name, dtype, length) in handle['arrays'].items():
+            blocks[name] = open_block(block_name)
+    except BaseException:
+        for block in blocks.values():
+            block.close()
+        raise
+    return SharedGraph(handle, blocks)
@@ -0,0 +1,251 @@
+"""
+view_store.py
+
+Stockage compact des propriétés visuelles des nœuds et des arêtes de pygraph.
+
+Au lieu d'un objet NodeView complet par nœud, les propriétés (couleur, position, échelle,
+largeur, étiquette) sont rangées dans des tableaux parallèles (module array) indexés par
+le numéro du nœud : une quarantaine d'octets par nœud. Les identifiants qui ne sont pas de
+petits entiers (chaînes, numéro isolé très grand) ont une ligne dans un dictionnaire. Les arêtes n'ont que leur couleur,
+le plus souvent celle par défaut : elle est gardée dans un dictionnaire creux.
+NodeView et EdgeView (pygraph.py) sont de simples mandataires construits à la demande.
+"""
+
+from array import array
+from math import isnan, nan
+
+from constantes import WHITE, BLACK, NODE_WIDTH
+
+
+# Columns of a node outside the arrays (NodeStore.sparse) and their defaults
+COLOR, X, Y, ECH, WIDTH, LABEL = range(6)
+DEFAULTS = (WHITE, nan, nan, 1.0, float(NODE_WIDTH), None)
+SPARSE_GAP = 1024 # A block of ids starting beyond 2 * len + SPARSE_GAP is sparse, unless it fills the gap
+
+
+def ordered(u, v):
+    # The ends of an undirected edge in a fixed order, ids of different types included
+    try:
+        return (u, v) if u <= v else (v, u)
+    except TypeError:
+        return tuple(sorted((u, v), key=lambda node_id: (type(node_id).__name__, str(node_id))))
+
+
+class NodeStore:
+    """
+    class NodeStore garde les propriétés visuelles des nœuds dans des tableaux parallèles.
+
+    Attributes:
+    -----------
+        color_ids : array('b')
+            numéro de couleur
+        xs, ys : array('d')
+            position, NaN si le nœud n'est pas positionné
+        echs : array('d')
+            échelle
+        widths : array('d')
+            largeur
+        labels : list
+            étiquette, None pour le numéro du nœud
+        sparse : dict
+            node_id: [couleur, x, y, échelle, largeur, étiquette] pour les nœuds hors des
+            tableaux : identifiants non entiers, ou trop grands pour agrandir les tableaux
+
+    Note:
+    -----
+        Les tableaux sont indexés par le numéro du nœud ; un grand numéro isolé (add_edge(0, 10**7))
+        ne les agrandit pas jusqu'à lui mais va dans sparse.
+    """
+
+    def __init__(self):
+        self.color_ids = array('b')
+        self.xs = array('d')
+        self.ys = array('d')
+        self.echs = array('d')
+        self.widths = array('d')
+        self.labels = []
+        self.sparse = {}
+
+    def __len__(self):
+        return len(self.color_ids)
+
+    def fits(self, node_id):
+        # node_id may be stored in the arrays without growing them much
+        return isinstance(node_id, int) and 0 <= node_id < 2 * len(self) + SPARSE_GAP
+
+    def reset(self, first, count=1):
+        # Default properties for the nodes first .. first + count - 1, the arrays grow if needed
+        if not self.fits(first):
+            # A block far beyond the arrays : isolated ids (or not ints) are sparse, a block of
+            # ids starts new arrays only if it is large enough to fill them
+            if count == 1 or count < first - len(self):
+                for node_id in range(first, first + count) if count > 1 else (first,):
+                    self.sparse[node_id] = list(DEFAULTS)
+                return
+        if self.sparse:
+            for node_id in range(first, first + count) if count < len(self.sparse) else list(self.sparse):
+                if isinstance(node_id, int) and first <= node_id < first + count:
+                    self.sparse.pop(node_id, None)
+        size = max(len(self), first + count)
+        grow = size - len(self)
+        if grow > 0:
+            self.color_ids.extend(array('b', [WHITE]) * grow)
+            self.xs.extend(array('d', [nan]) * grow)
+            self.ys.extend(array('d', [nan]) * grow)
+            self.echs.extend(array('d', [1]) * grow)
+            self.widths.extend(array('d', [float(NODE_WIDTH)]) * grow)
+            self.labels.extend([None] * grow)
+        old = count - grow
+        if old > 0:
+            last = first + old
+            self.color_ids[first:last] = array('b', [WHITE]) * old
+            self.xs[first:last] = array('d', [nan]) * old
+            self.ys[first:last] = array('d', [nan]) * old
+            self.echs[first:last] = array('d', [1]) * old
+            self.widths[first:last] = array('d', [float(NODE_WIDTH)]) * old
+            self.labels[first:last] = [None] * old
+
+    def reset_nodes(self, node_ids):
+        # Default properties for node_ids : the block of small ids at once, the others one by one
+        node_ids = list(node_ids)
+        bound = 2 * len(node_ids) + SPARSE_GAP
+        dense = [node_id for node_id in node_ids if isinstance(node_id, int) and 0 <= node_id < bound]
+        if dense:
+            self.reset(0, max(dense) + 1)
+        if len(dense) < len(node_ids):
+            for node_id in set(node_ids).difference(dense):
+                self.reset(node_id)
+
+    def clear(self):
+        self.__init__()
+
+    def copy(self):
+        store = NodeStore()
+        for name in ('color_ids', 'xs', 'ys', 'echs', 'widths'):
+            setattr(store, name, array(getattr(self, name).typecode, getattr(self, name)))
+        store.labels = list(self.labels)
+        store.sparse = {node_id: list(row) for node_id, row in self.sparse.items()}
+        return store
+
+    def nbytes(self):
+        arrays = (self.color_ids, self.xs, self.ys, self.echs, self.widths)
+        return sum(a.itemsize * len(a) for a in arrays) + 8 * len(self.labels) + 200 * len(self.sparse)
+
+    # -- about one node
+
+    def row(self, node_id):
+        # Properties of a sparse node, None for a node in the arrays
+        return self.sparse.get(node_id) if self.sparse else None
+
+    def color_id(self, node_id):
+        row = self.row(node_id)
+        return self.color_ids[node_id] if row is None else row[COLOR]
+
+    def set_color_id(self, node_id, color_id):
+        row = self.row(node_id)
+        if row is None:
+            self.color_ids[node_id] = color_id
+        else:
+            row[COLOR] = color_id
+
+    def pos(self, node_id):
+        row = self.row(node_id)
+        x, y = (self.xs[node_id], self.ys[node_id]) if row is None else (row[X], row[Y])
+        return None if isnan(x) else [x, y]
+
+    def set_pos(self, node_id, pos):
+        x, y = (nan, nan) if pos is None else pos
+        row = self.row(node_id)
+        if row is None:
+            self.xs[node_id], self.ys[node_id] = x, y
+        else:
+            row[X], row[Y] = x, y
+
+    def ech(self, node_id):
+        row = self.row(node_id)
+        return self.echs[node_id] if row is None else row[ECH]
+
+    def set_ech(self, node_id, ech):
+        row = self.row(node_id)
+        if row is None:
+            self.echs[node_id] = ech
+        else:
+            row[ECH] = ech
+
+    def width(self, node_id):
+        row = self.row(node_id)
+        return self.widths[node_id] if row is None else row[WIDTH]
+
+    def set_width(self, node_id, width):
+        row = self.row(node_id)
+        if row is None:
+            self.widths[node_id] = width
+        else:
+            row[WIDTH] = width
+
+    def label(self, node_id):
+        row = self.row(node_id)
+        label = self.labels[node_id] if row is None else row[LABEL]
+        return str(node_id) if label is None else label
+
+    def set_label(self, node_id, label):
+        row = self.row(node_id)
+        if row is None:
+            self.labels[node_id] = label
+        else:
+            row[LABEL] = label
+
+    def dot_attributes(self, node_id):
+        # DOT attributes of the node read in the columns : pos (scaled) once positioned, width
+        # and height if not the default width, label if set ; None if there is none
+        row = self.row(node_id)
+        if row is None:
+            x, y, ech, width, label = self.xs[node_id], self.ys[node_id], self.echs[node_id], self.widths[node_id], self.labels[node_id]
+        else:
+            x, y, ech, width, label = row[X], row[Y], row[ECH], row[WIDTH], row[LABEL]
+        attributes = {}
+        if not isnan(x):
+            attributes['pos'] = f'{x*ech},{y*ech}!'
+        if width != DEFAULTS[WIDTH]:
+            attributes['width'] = attributes['height'] = str(width)
+        if label is not None:
+            attributes['label'] = label
+        return attributes or None
+
+
+class EdgeStore:
+    """
+    class EdgeStore garde la couleur des arêtes qui n'ont pas la couleur par défaut (BLACK).
+
+    Parameters:
+    -----------
+        directed : bool
+            pour un graphe non orienté (u, v) et (v, u) désignent la même arête
+    """
+
+    def __init__(self, directed=False):
+        self.directed = directed
+        self.color_ids = {}
+
+    def key(self, u, v):
+        return (u, v) if self.directed else ordered(u, v)
+
+    def color_id(self, u, v):
+        return self.color_ids.get(self.key(u, v), BLACK)
+
+    def set_color_id(self, u, v, color_id):
+        if color_id == BLACK:
+            self.color_ids.pop(self.key(u, v), None)
+        else:
+            self.color_ids[self.key(u, v)] = color_id
+
+    def discard(self, u, v):
+        self.color_ids.pop(self.key(u, v), None)
+
+    def clear(self):
+        self.color_ids.clear()
+
+    def copy(self):
+        store = EdgeStore(self.directed)
+        store.color_ids = dict(self.color_ids)
+        return store